@@ -1,110 +1,301 @@
-import aiohttp
-import asyncio
-import json
+"""
+Builds the item id -> icon URL index (Cache\\item_icons.json) that alert thumbnails use.
+
+    python IconsCacher.py           index the whole auction house, then again every 60 seconds
+    python IconsCacher.py --once    a single pass
+
+--hypixel and --coflnet point it at a local stand-in such as mock_api.py.
+
+main.py runs the same IconIndexer in the background over the ids its scans have
+already decoded, so this script is only needed to index items outside ALLOWED_CATEGORIES.
+"""
+
 import time
+import argparse
+import asyncio
 
-from NBT_Decoder import ItemDecoder
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+from aiohttp import ClientSession
+from cache_store import JournalDict, write_checkpoints
+from tag_cache import TagCache
+from NBT_Decoder import decode_batch
+from page_parser import loads, parse_page
+from http_client import HttpClient
+from rate_limiter import RateLimiter, limiter_for, retry_after
 
-# Load cached icons
-with open("Cache\\item_icons.json", "r") as f:
-    cached_icons: dict = json.load(f)
-    print(f"[DEBUG] Loaded {len(cached_icons)} cached icons")
+ICONS_PATH = "Cache\\item_icons.json"
+TAG_CACHE_PATH = "Cache\\tag_cache.bin"
 
+HYPIXEL_API = "https://api.hypixel.net"
+COFLNET_API = "https://sky.coflnet.com"
 
-async def fetch_json(session, url, retries=40, delay=2):
-    """Fetch JSON data with retries and exponential backoff."""
-    for attempt in range(retries):
+# -----------------------------
+# FETCHING
+# -----------------------------
+
+async def fetch_raw(session: ClientSession, url: str, attempts: int = 5, reserve: float = 0.0) -> Optional[bytes]:
+    """GETs through the host's shared rate limiter, retrying failures with backoff."""
+    limiter = limiter_for(url)
+    for attempt in range(attempts):
+        await limiter.acquire(reserve)
         try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 429:
-                    wait_time = delay * (attempt + 1)
-                    print(f"[DEBUG] Rate limited (429). Waiting {wait_time:.2f}s before retry...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    print(f"[DEBUG] Request failed with status {response.status}, retrying...")
-        except Exception as e:
-            print(f"[ERROR] Exception during request: {e}")
-            await asyncio.sleep(delay * (attempt + 1))
-    print(f"[ERROR] Failed to fetch {url} after {retries} retries")
+            async with session.get(url) as resp:
+                if resp.status == 200:
+                    raw = await resp.read()
+                    limiter.on_success()
+                    return raw
+                if resp.status == 429:
+                    limiter.on_throttle(retry_after(resp.headers))
+                elif resp.status == 404:
+                    return None
+        except Exception:
+            pass
+        await asyncio.sleep(0.5 * 2 ** attempt)
     return None
 
+# -----------------------------
+# ICON INDEX
+# -----------------------------
 
-async def getItemBytesFromAuctions(session):
-    print("[DEBUG] Fetching total auction pages...")
-    data = await fetch_json(session, "https://api.hypixel.net/v2/skyblock/auctions")
-    if not data:
-        return []
+class IconIndexer:
+    """
+    Fills an item id -> icon URL JournalDict from coflnet's item details.
 
-    totalPages = data.get("totalPages", 0)
-    print(f"[DEBUG] Total pages to fetch: {totalPages}")
+    Only ids missing from the index are queried, each at most once per pass, with
+    `concurrency` requests in flight. Results are applied to the index `batch_size`
+    at a time in a single update, so a batch lands in one journal append. Ids coflnet
+    doesn't know are skipped for `unknown_retry` seconds instead of every pass.
 
-    AuctionBytes = []
+    index() shares the coflnet limiter with whatever else the process asks coflnet, so it
+    can be held to `max_rate` requests/s of its own and to the limiter's spare capacity
+    (`reserve`, see RateLimiter.acquire). icon_for() is for alerts and skips both.
+    """
 
-    for page in range(totalPages):
-        print(f"[DEBUG] Fetching auctions for page {page}...")
-        page_data = await fetch_json(session, f"https://api.hypixel.net/v2/skyblock/auctions?page={page}")
-        if not page_data:
-            continue
+    def __init__(self, icons: JournalDict, api: str = COFLNET_API, concurrency: int = 4,
+                 batch_size: int = 50, unknown_retry: float = 3600, persist: bool = False,
+                 max_rate: Optional[float] = None, reserve: float = 0.0):
+        self.icons = icons
+        self.api = api.rstrip("/")
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.unknown_retry = unknown_retry
+        # Write each batch to disk straight away; off when the owner checkpoints the index itself
+        self.persist = persist
+        self.reserve = reserve
+        self._budget = RateLimiter(max_rate, min_rate=max_rate, max_rate=max_rate, step=0) if max_rate else None
 
-        auctionsForPage = page_data.get("auctions", [])
-        print(f"[DEBUG] Found {len(auctionsForPage)} auctions on page {page}")
+        self._unknown: Dict[str, float] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
 
-        for idx, auction in enumerate(auctionsForPage):
-            if auction.get("bin"):
-                item_bytes = auction.get("item_bytes")
-                AuctionBytes.append(item_bytes)
-                if idx < 5:
-                    print(f"[DEBUG] Auction {idx} item_bytes: {item_bytes[:50]}...")
+        self.hits = 0
+        self.misses = 0
+        self.fetched = 0
+        self.failed = 0
 
-    print(f"[DEBUG] Total auction items fetched: {len(AuctionBytes)}")
-    return AuctionBytes
+    def hit_rate(self) -> float:
+        """Share of icon_for lookups answered without a request."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
 
+    def missing(self, item_ids: Iterable[str]) -> List[str]:
+        now = time.time()
+        wanted = set()
+        for item_id in item_ids:
+            if (
+                item_id
+                and not item_id.startswith("UNKNOWN::")
+                and item_id not in self.icons
+                and self._unknown.get(item_id, 0) <= now
+            ):
+                wanted.add(item_id)
+        return sorted(wanted)
 
-async def fetch_icon(session, item_tag, semaphore):
-    """Fetch item icon, respecting the semaphore to limit concurrency."""
-    if item_tag in cached_icons:
-        print(f"[DEBUG] Item {item_tag} already cached")
-        return
+    async def _fetch_icon(self, session: ClientSession, item_id: str, background: bool) -> Optional[str]:
+        url = f"{self.api}/api/item/{item_id}/details"
+        if background:
+            if self._budget is not None:
+                await self._budget.acquire()
+            raw = await fetch_raw(session, url, attempts=3, reserve=self.reserve)
+        else:
+            raw = await fetch_raw(session, url, attempts=3)
+        try:
+            url = loads(raw).get("iconUrl") if raw else None
+        except ValueError:
+            url = None
 
-    async with semaphore:  # Limit concurrent requests
-        print(f"[DEBUG] Item {item_tag} not in cache, fetching icon...")
-        data = await fetch_json(session, f"https://sky.coflnet.com/api/item/{item_tag}/details")
-        if data and "iconUrl" in data:
-            cached_icons[item_tag] = data["iconUrl"]
-            print(f"[DEBUG] Cached icon for {item_tag}: {data['iconUrl']}")
-            with open("Cache\\item_icons.json", "w") as file:
-                json.dump(cached_icons, file, indent=4)
-                print(f"[DEBUG] Updated cache file")
+        if url:
+            self.fetched += 1
+        else:
+            self.failed += 1
+            self._unknown[item_id] = time.time() + self.unknown_retry
+        return url
 
+    def _shared_fetch(self, session: ClientSession, item_id: str, background: bool = False) -> asyncio.Future:
+        """Starts a details request for the id, or joins the one already running."""
+        pending = self._in_flight.get(item_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch_icon(session, item_id, background))
+            self._in_flight[item_id] = pending
+            pending.add_done_callback(lambda _: self._in_flight.pop(item_id, None))
+        return pending
 
-async def cacheIcons():
-    while True:
-        try:
-            CONCURRENT_REQUESTS = 3
-            semaphore = asyncio.Semaphore(CONCURRENT_REQUESTS)
+    async def _commit(self, batch: Dict[str, str]):
+        if not batch:
+            return
+        self.icons.update(batch)
+        batch.clear()
+        if self.persist:
+            await asyncio.to_thread(write_checkpoints, [self.icons.checkpoint()])
+
+    async def icon_for(self, session: ClientSession, item_id: str) -> Optional[str]:
+        """The indexed icon, fetching and indexing it first if needed."""
+        url = self.icons.get(item_id)
+        if url or item_id not in self.missing([item_id]):
+            self.hits += 1
+            return url
+        self.misses += 1
+        url = await asyncio.shield(self._shared_fetch(session, item_id))
+        if url:
+            await self._commit({item_id: url})
+        return url
+
+    async def index(self, session: ClientSession, item_ids: Iterable[str]) -> int:
+        """Indexes every id not in the index yet. Returns how many were added."""
+        todo = self.missing(item_ids)
+        if not todo:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        batch: Dict[str, str] = {}
+        added = 0
+
+        async def one(item_id: str):
+            nonlocal added
+            async with semaphore:
+                url = await asyncio.shield(self._shared_fetch(session, item_id, background=True))
+            if url:
+                batch[item_id] = url
+                added += 1
+                if len(batch) >= self.batch_size:
+                    await self._commit(batch)
+
+        await asyncio.gather(*(one(item_id) for item_id in todo))
+        await self._commit(batch)
+        return added
+
+    async def run_forever(self, session: ClientSession, source, interval: float = 60):
+        """Re-indexes `source()`'s ids every `interval` seconds; meant as a background task."""
+        while True:
+            try:
+                added = await self.index(session, source())
+                if added:
+                    print(f"[Icons] Indexed {added} new icons ({len(self.icons):,} total)")
+            except Exception as e:
+                print(f"[Icons] Indexing failed: {e}")
+            await asyncio.sleep(interval)
+
+# -----------------------------
+# STANDALONE: EVERY ITEM ON THE AUCTION HOUSE
+# -----------------------------
+
+async def collect_item_ids(session: ClientSession, pool: ProcessPoolExecutor, tags: TagCache,
+                           api: str = HYPIXEL_API, concurrency: int = 10) -> Set[str]:
+    """
+    Every item id currently on the auction house. Pages are fetched concurrently and
+    parsed on the pool; identical item_bytes are decoded once, and ones the main
+    process's tag cache already knows aren't decoded at all.
+    """
+    loop = asyncio.get_running_loop()
+    url = f"{api.rstrip('/')}/v2/skyblock/auctions"
+
+    raw = await fetch_raw(session, f"{url}?page=0")
+    if raw is None:
+        return set()
+    first = await loop.run_in_executor(pool, parse_page, raw, None)
+    total_pages = first.meta.get("totalPages", 0)
+    print(f"[Icons] Scanning {total_pages} pages...")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def get_page(page: int):
+        async with semaphore:
+            raw = await fetch_raw(session, f"{url}?page={page}")
+        if raw is None:
+            print(f"[Icons] Page {page} failed, skipping")
+            return None
+        return await loop.run_in_executor(pool, parse_page, raw, None)
+
+    pages = [first] + await asyncio.gather(*(get_page(page) for page in range(1, total_pages)))
+
+    item_ids: Set[str] = set()
+    misses: Dict[bytes, str] = {}
+    for page in pages:
+        if page is None:
+            continue
+        for auc in page.auctions:
+            if auc.item_bytes is None:
+                continue
+            key = TagCache.key_for(auc.item_bytes)
+            record = tags.get(key)
+            if record is not None:
+                item_ids.add(record.id)
+            else:
+                misses.setdefault(key, auc.item_bytes)
+
+    if misses:
+        blobs = list(misses.values())
+        chunks = [blobs[i:i + 256] for i in range(0, len(blobs), 256)]
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, decode_batch, chunk, ("SkyBlock_id",)) for chunk in chunks
+        ))
+        for values in results:
+            item_ids.update(v[0] for v in values if v is not None and v[0] is not None)
+
+    print(f"[Icons] {len(item_ids):,} distinct ids, {len(misses):,} decoded, the rest from the tag cache")
+    return item_ids
+
+
+async def cacheIcons(once: bool = False, hypixel_api: str = HYPIXEL_API, coflnet_api: str = COFLNET_API):
+    icons = JournalDict(ICONS_PATH)
+    icons.load()
+    print(f"[Icons] Loaded {len(icons):,} cached icons")
+
+    # Read-only: the main process owns the tag cache file, so it is never written here
+    tags = TagCache(TAG_CACHE_PATH)
+    try:
+        tags.load()
+    except Exception as e:
+        print(f"[Icons] Tag cache unavailable, decoding everything: {e}")
 
-            async with aiohttp.ClientSession() as session:
-                AuctionBytes = await getItemBytesFromAuctions(session)
-                print(f"[DEBUG] Decoding and caching icons for {len(AuctionBytes)} items...")
+    indexer = IconIndexer(icons, api=coflnet_api, persist=True)
 
-                tasks = []
-                for idx, itemBytes in enumerate(AuctionBytes):
-                    item_tag = ItemDecoder.decode(itemBytes).get("SkyBlock_id")
-                    print(f"[DEBUG] Processing item {idx}: {item_tag}")
-                    tasks.append(fetch_icon(session, item_tag, semaphore))
+    with ProcessPoolExecutor() as pool:
+        # One client for every run, so connections to both APIs stay open between runs
+        async with HttpClient(limit_per_host=10) as http:
+            while True:
+                start = time.time()
+                try:
+                    item_ids = await collect_item_ids(http.session, pool, tags, api=hypixel_api)
+                    added = await indexer.index(http.session, item_ids)
+                    print(
+                        f"[Icons] Pass done in {time.time() - start:.1f}s: {added} new, "
+                        f"{indexer.failed} unknown to coflnet, {len(icons):,} total"
+                    )
+                except Exception as e:
+                    print(f"[Icons] Something went wrong: {e}")
 
-                # Run all tasks concurrently, respecting the semaphore
-                await asyncio.gather(*tasks)
+                if once:
+                    break
+                await asyncio.sleep(60)  # wait 60 seconds before next run
 
-        except Exception as e:
-            print(f"Something went wrong: \n{e}")
-    
-        print("[DEBUG] Done")
-        await asyncio.sleep(60)  # wait 60 seconds before next run
+    write_checkpoints([icons.checkpoint()])
 
 
 if __name__ == "__main__":
-    asyncio.run(cacheIcons())
-    
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true")
+    parser.add_argument("--hypixel", default=HYPIXEL_API)
+    parser.add_argument("--coflnet", default=COFLNET_API)
+    args = parser.parse_args()
+    asyncio.run(cacheIcons(args.once, args.hypixel, args.coflnet))
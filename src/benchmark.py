@@ -0,0 +1,438 @@
+"""
+End-to-end benchmark against a local stand-in for Hypixel, coflnet and Discord.
+
+    python benchmark.py                                       10k and 100k auctions, 0% and 50% duplicates
+    python benchmark.py --scales 10000,100000,500000 --duplicates 0,0.5,0.9 --json bench.json
+    python benchmark.py --snapshots Snapshots                 a recording from mock_api.py instead
+
+For every scale and duplicate ratio a synthetic auction house is generated (real
+gzipped NBT item_bytes, reforged and starred names, a few underpriced listings),
+served by mock_api.py in a separate process, and pushed through:
+
+    fetch_bins_cold     fetch_bins_async with empty tag and name caches
+    fetch_bins_warm     fetch_bins_async again, caches warm
+    decode_pool         decode_records over every item_bytes, empty tag cache
+    decode_single       decode_fields in-process, one item at a time
+    clean_name_cold     the batch name normaliser over every name, empty cache
+    clean_name_warm     the same names again
+    find_flips          a full scan including volume lookups, icons and alerts, with
+                        its per-stage breakdown from the scan metrics
+    alerts_drained      until the notifier queue is empty
+
+Each stage reports seconds, items/s and peak memory (the stage's own RSS high-water
+on Linux, the process's elsewhere, plus traced Python allocations with --trace-memory)
+as JSON for regression comparison.
+The shared rate limiter is opened up for the local server, so stages measure our
+own work rather than the pacing meant for the real APIs.
+"""
+
+import os
+import sys
+import json
+import time
+import gzip
+import base64
+import random
+import shutil
+import socket
+import struct
+import asyncio
+import argparse
+import platform
+import tempfile
+import importlib
+import subprocess
+import tracemalloc
+import urllib.request
+
+from typing import Any, Dict, List, Tuple
+from metrics import memory_mb, reset_peak_rss
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SRC_DIR)
+
+PAGE_SIZE = 1000
+
+# -----------------------------
+# SYNTHETIC AUCTIONS
+# -----------------------------
+
+_TAG_BYTE, _TAG_SHORT, _TAG_LONG, _TAG_STRING, _TAG_LIST, _TAG_COMPOUND = 1, 2, 4, 8, 9, 10
+
+def _nbt_string(value: str) -> bytes:
+    raw = value.encode("utf-8")
+    return struct.pack(">H", len(raw)) + raw
+
+def _named(tag_type: int, name: str, payload: bytes) -> bytes:
+    return bytes([tag_type]) + _nbt_string(name) + payload
+
+def encode_item(item_id: str, name: str, lore: List[str], uuid: str, count: int = 1) -> str:
+    """Base64 gzipped NBT shaped like the API's item_bytes: {i: [{id, Count, tag: {...}, Damage}]}."""
+    display = (
+        _named(_TAG_STRING, "Name", _nbt_string(name))
+        + _named(_TAG_LIST, "Lore", bytes([_TAG_STRING]) + struct.pack(">i", len(lore)) + b"".join(map(_nbt_string, lore)))
+        + b"\0"
+    )
+    extra = (
+        _named(_TAG_STRING, "id", _nbt_string(item_id))
+        + _named(_TAG_STRING, "uuid", _nbt_string(uuid))
+        + _named(_TAG_LONG, "timestamp", struct.pack(">q", 1_700_000_000_000))
+        + b"\0"
+    )
+    item = (
+        _named(_TAG_SHORT, "id", struct.pack(">h", 276))
+        + _named(_TAG_BYTE, "Count", struct.pack(">b", count))
+        + _named(_TAG_COMPOUND, "tag", _named(_TAG_COMPOUND, "display", display) + _named(_TAG_COMPOUND, "ExtraAttributes", extra) + b"\0")
+        + _named(_TAG_SHORT, "Damage", struct.pack(">h", 0))
+        + b"\0"
+    )
+    root = _named(_TAG_COMPOUND, "", _named(_TAG_LIST, "i", bytes([_TAG_COMPOUND]) + struct.pack(">i", 1) + item) + b"\0")
+    return base64.b64encode(gzip.compress(root, compresslevel=6, mtime=0)).decode("ascii")
+
+def build_auctions(count: int, duplicate_ratio: float, reforges: List[str], distinct_items: int = 2000,
+                   seed: int = 1) -> List[Dict[str, Any]]:
+    """
+    `duplicate_ratio` of the auctions reuse the exact item_bytes (and name) of an
+    earlier auction, the way identical items do on the real auction house.
+    """
+    rng = random.Random(seed)
+    item_ids = [f"BENCH_ITEM_{i}" for i in range(distinct_items)]
+    base_price = {item_id: rng.randint(1, 200) * 500_000 for item_id in item_ids}
+    categories = ["weapon", "armor", "accessories", "misc", "blocks", "consumables"]
+    category_of = {item_id: rng.choice(categories) for item_id in item_ids}
+    lore = ["§7Damage: §c+260", "§7Strength: §c+150", "§7Intelligence: §a+350", "§6Ability: Wither Impact §eRIGHT CLICK"] * 3
+
+    pool: List[Tuple[str, str, str]] = []
+    auctions = []
+    for i in range(count):
+        if pool and rng.random() < duplicate_ratio:
+            item_id, name, item_bytes = rng.choice(pool)
+        else:
+            item_id = rng.choice(item_ids)
+            words = item_id.replace("BENCH_ITEM_", "Bench Item ")
+            name = f"{rng.choice(reforges)} {words}" if rng.random() < 0.6 else words
+            stars = rng.randint(0, 5)
+            if stars:
+                name += " " + "✪" * stars
+            item_bytes = encode_item(item_id, name, lore, f"{rng.getrandbits(128):032x}")
+            pool.append((item_id, name, item_bytes))
+
+        # Mostly around the base price, with the odd underpriced listing to alert on
+        price = base_price[item_id] * rng.uniform(0.95, 1.6)
+        if rng.random() < 0.01:
+            price = base_price[item_id] * 0.5
+
+        auctions.append({
+            "uuid": f"{rng.getrandbits(128):032x}",
+            "auctioneer": f"{rng.getrandbits(128):032x}",
+            "profile_id": f"{rng.getrandbits(128):032x}",
+            "coop": [],
+            "start": 1_700_000_000_000,
+            "end": 1_700_100_000_000,
+            "item_name": name,
+            "item_lore": "\n".join(lore),
+            "extra": f"{name} Bench Item",
+            "category": category_of[item_id],
+            "tier": "LEGENDARY",
+            "starting_bid": int(price),
+            "item_bytes": item_bytes,
+            "claimed": False,
+            "claimed_bidders": [],
+            "highest_bid_amount": 0,
+            "last_updated": 1_700_000_000_000,
+            "bin": rng.random() < 0.85,
+            "bids": [],
+        })
+    return auctions
+
+def write_snapshot(directory: str, auctions: List[Dict[str, Any]], last_updated: int = 1_700_000_000_000):
+    """Lays the auctions out as one mock_api.py snapshot."""
+    snapshot_dir = os.path.join(directory, "0000")
+    os.makedirs(snapshot_dir, exist_ok=True)
+    total_pages = max(1, -(-len(auctions) // PAGE_SIZE))
+    for page in range(total_pages):
+        chunk = auctions[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+        with open(os.path.join(snapshot_dir, f"page_{page}.json"), "w") as f:
+            json.dump({
+                "success": True, "page": page, "totalPages": total_pages,
+                "totalAuctions": len(auctions), "lastUpdated": last_updated, "auctions": chunk,
+            }, f)
+    with open(os.path.join(snapshot_dir, "ended.json"), "w") as f:
+        json.dump({"success": True, "lastUpdated": last_updated, "auctions": []}, f)
+
+def load_snapshot(directory: str) -> List[Dict[str, Any]]:
+    """Every auction in the first snapshot of a mock_api.py recording."""
+    snapshot_dir = os.path.join(directory, sorted(
+        name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name))
+    )[0])
+    auctions = []
+    for name in sorted(os.listdir(snapshot_dir)):
+        if name.startswith("page_"):
+            with open(os.path.join(snapshot_dir, name), "r") as f:
+                auctions.extend(json.load(f).get("auctions", []))
+    return auctions
+
+# -----------------------------
+# MEASUREMENT
+# -----------------------------
+
+class Stage:
+    def __init__(self, results: List[Dict[str, Any]], case: Dict[str, Any], name: str, items: int,
+                 trace_memory: bool):
+        self.results = results
+        self.case = case
+        self.name = name
+        self.items = items
+        self.trace_memory = trace_memory
+        self.extra: Dict[str, Any] = {}
+
+    def __enter__(self) -> "Stage":
+        self.per_stage_peak = reset_peak_rss()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        result = {
+            **self.case,
+            "stage": self.name,
+            "seconds": round(elapsed, 4),
+            "items": self.items,
+            "per_second": round(self.items / elapsed) if elapsed > 0 else None,
+            "peak_rss_mb": memory_mb()[1],
+            "peak_is_per_stage": self.per_stage_peak,
+            "traced_peak_mb": round(tracemalloc.get_traced_memory()[1] / 2**20, 1) if self.trace_memory else None,
+            **self.extra,
+        }
+        self.results.append(result)
+        print(
+            f"[Bench] {self.case['auctions']:>7,} auctions, {self.case['duplicate_ratio']:.0%} dup | "
+            f"{self.name:<16} {elapsed:8.3f}s  {result['per_second'] or 0:>10,}/s  "
+            f"rss {result['peak_rss_mb']} MB"
+        )
+
+# -----------------------------
+# MOCK SERVER
+# -----------------------------
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_mock(snapshots_dir: str, port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SRC_DIR, "mock_api.py"), "serve", snapshots_dir,
+         "--port", str(port), "--interval", "0"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("mock_api.py did not start")
+
+def mock_stats(port: int) -> Dict[str, Any]:
+    return json.loads(urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=5).read())
+
+# -----------------------------
+# STAGES
+# -----------------------------
+
+def import_main(workdir: str, api: str):
+    """Imports main.py inside `workdir`, configured against the mock server."""
+    with open(os.path.join(REPO_DIR, "Settings.json"), "r") as f:
+        settings = json.load(f)
+    settings.update({
+        "HYPIXEL_API": api,
+        "COFLNET_API": api,
+        "WEBHOOK_URL": f"{api}/webhook",
+        "PROFILES_DIR": "NoProfiles",
+        "INCREMENTAL_SCANS": False,
+    })
+    with open(os.path.join(workdir, "PRIVATE_SETTINGS.json"), "w") as f:
+        json.dump(settings, f)
+    shutil.copy(os.path.join(REPO_DIR, "Reforges.json"), workdir)
+    os.makedirs(os.path.join(workdir, "Cache"), exist_ok=True)
+
+    os.chdir(workdir)
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    main = importlib.import_module("main")
+    main.configure()
+
+    from rate_limiter import limiter_for
+    limiter = limiter_for(api)
+    limiter.rate = limiter.max_rate = 100_000
+    main.SCAN_DEADLINE = 600
+    main.metrics.enabled = True
+    return main
+
+def _fresh_caches(main, tags: bool = True, names: bool = True):
+    from tag_cache import TagCache
+    if tags:
+        main._tag_cache = TagCache(os.path.join("Cache", "bench_tags.bin"))
+    if names:
+        main.name_normaliser.cache_clear()
+
+async def run_case(main, port: int, auctions: List[Dict[str, Any]], case: Dict[str, Any],
+                   results: List[Dict[str, Any]], trace_memory: bool):
+    n = len(auctions)
+    item_bytes = [auc["item_bytes"] for auc in auctions]
+    names = [auc["item_name"] for auc in auctions]
+    session = await main.http.start()
+
+    def stage(name: str, items: int) -> Stage:
+        return Stage(results, case, name, items, trace_memory)
+
+    # Page 0 doubles as the meta request, exactly as refresh_market fetches it
+    _fresh_caches(main)
+    with stage("fetch_bins_cold", n) as s:
+        first = await main.fetch_page(session, 0, asyncio.Semaphore(1))
+        await main.fetch_bins_async(session, first)
+        s.extra["bins_tracked"] = len(main.market)
+
+    with stage("fetch_bins_warm", n) as s:
+        first = await main.fetch_page(session, 0, asyncio.Semaphore(1))
+        await main.fetch_bins_async(session, first)
+        s.extra["tag_hit_rate"] = round(main._tag_cache.stats()["hit_rate"], 4)
+
+    _fresh_caches(main, names=False)
+    with stage("decode_pool", n) as s:
+        records = await main.decode_records(item_bytes)
+        s.extra["decoded"] = sum(record is not None for record in records)
+
+    sample = list(dict.fromkeys(item_bytes))[:20_000]
+    with stage("decode_single", len(sample)):
+        for blob in sample:
+            main.decode_item(blob)
+
+    _fresh_caches(main, tags=False)
+    with stage("clean_name_cold", n):
+        main.name_normaliser.clean_many(names)
+
+    with stage("clean_name_warm", n) as s:
+        main.name_normaliser.clean_many(names)
+        s.extra["name_hit_rate"] = round(main.name_normaliser.stats()["hit_rate"], 4)
+
+    main.market.last_updated = None
+    posts_before = mock_stats(port)["webhook_posts"]
+    with stage("find_flips", n) as s:
+        main.metrics.begin_scan()
+        await main.find_flips()
+        s.extra["stages"] = main.metrics.end_scan()["stages"]
+
+    notifiers = [profile.notifier for profile in main.PROFILES]
+    with stage("alerts_drained", sum(notifier.pending for notifier in notifiers)) as s:
+        while any(notifier.pending for notifier in notifiers):
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(max(notifier.batch_delay for notifier in notifiers) + 0.1)
+        s.extra["webhook_posts"] = mock_stats(port)["webhook_posts"] - posts_before
+
+async def run_all(args) -> Dict[str, Any]:
+    with open(os.path.join(REPO_DIR, "Reforges.json"), "r") as f:
+        reforges = json.load(f).get("Reforges", []) or ["Heroic"]
+
+    if args.snapshots:
+        cases = [(None, None)]
+    else:
+        cases = [(scale, dup) for scale in args.scales for dup in args.duplicates]
+
+    workdir = tempfile.mkdtemp(prefix="ah_bench_")
+    results: List[Dict[str, Any]] = []
+    main = None
+    if args.trace_memory:
+        tracemalloc.start()
+
+    try:
+        for scale, dup in cases:
+            snapshots_dir = os.path.join(workdir, "snapshots")
+            shutil.rmtree(snapshots_dir, ignore_errors=True)
+
+            if args.snapshots:
+                shutil.copytree(args.snapshots, snapshots_dir)
+                auctions = load_snapshot(snapshots_dir)
+                case = {"auctions": len(auctions), "duplicate_ratio": 0.0, "dataset": args.snapshots}
+            else:
+                start = time.perf_counter()
+                auctions = build_auctions(scale, dup, reforges, seed=args.seed)
+                write_snapshot(snapshots_dir, auctions)
+                case = {"auctions": scale, "duplicate_ratio": dup, "dataset": "synthetic"}
+                print(f"[Bench] Generated {scale:,} auctions ({dup:.0%} duplicates) in {time.perf_counter() - start:.1f}s")
+
+            port = _free_port()
+            server = start_mock(snapshots_dir, port)
+            try:
+                api = f"http://127.0.0.1:{port}"
+                if main is None:
+                    main = import_main(workdir, api)
+                    await main.start_decode_pool()
+                    for profile in main.PROFILES:
+                        await profile.notifier.start(await main.http.start())
+                else:
+                    _point_at(main, api)
+                await run_case(main, port, auctions, case, results, args.trace_memory)
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        if main is not None:
+            for profile in main.PROFILES:
+                await profile.notifier.close()
+            await main.volumes.close()
+            await main.http.close()
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "json_backend": getattr(main, "JSON_BACKEND", None),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+def _point_at(main, api: str):
+    """Re-targets an already imported main at a new mock server port."""
+    from rate_limiter import limiter_for
+    main.AUCTIONS_URL = f"{api}/v2/skyblock/auctions"
+    main.AUCTIONS_ENDED_URL = f"{api}/v2/skyblock/auctions_ended"
+    main.COFLNET_API = api
+    main.volumes.api = api
+    main.icon_indexer.api = api
+    for profile in main.PROFILES:
+        profile.notifier.webhook_url = f"{api}/webhook"
+    limiter = limiter_for(api)
+    limiter.rate = limiter.max_rate = 100_000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="10000,100000", help="comma separated auction counts")
+    parser.add_argument("--duplicates", default="0,0.5", help="comma separated duplicate ratios")
+    parser.add_argument("--snapshots", help="benchmark a mock_api.py recording instead of synthetic data")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--trace-memory", action="store_true", help="also trace Python allocations (slower)")
+    parser.add_argument("--json", help="write the results here")
+    args = parser.parse_args()
+    args.scales = [int(x) for x in args.scales.split(",")]
+    args.duplicates = [float(x) for x in args.duplicates.split(",")]
+    if args.snapshots:
+        args.snapshots = os.path.abspath(args.snapshots)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    report = asyncio.run(run_all(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[Bench] Results written to {args.json}")
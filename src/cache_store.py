@@ -0,0 +1,151 @@
+import os
+import json
+import threading
+
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# -----------------------------
+# JOURNALLED JSON CACHES
+# -----------------------------
+#
+# A cache lives in two files:
+#   <path>          a JSON snapshot, replaced atomically on compaction
+#   <path>.journal  one [key, value] JSON line per change since that snapshot
+#
+# Saving appends only the changed keys; compaction folds the journal back into the
+# snapshot. Replaying a journal over a snapshot that already holds its entries is
+# harmless, so a crash between the two steps loses nothing.
+
+_MISSING = object()
+
+# Serialises every writer so an append never races a compaction of the same file
+_write_lock = threading.Lock()
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def set_aside_files(paths: Iterable[str]) -> List[str]:
+    """Moves each existing file to <file>.corrupt. Returns the paths moved."""
+    moved = []
+    with _write_lock:
+        for path in paths:
+            if os.path.exists(path):
+                os.replace(path, path + ".corrupt")
+                moved.append(path)
+    return moved
+
+
+class JournalDict(dict):
+    """A str -> JSON value dict that remembers which keys changed since the last save."""
+
+    def __init__(self, path: str, compact_after: int = 5000):
+        super().__init__()
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_after = compact_after
+
+        self._dirty: Dict[str, Any] = {}
+        self._journal_entries = 0
+
+    def __setitem__(self, key: str, value: Any):
+        if dict.get(self, key, _MISSING) != value:
+            self._dirty[key] = value
+        super().__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                dict.update(self, json.load(f))
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+
+            # Only newline-terminated lines that parse count; the first one that doesn't
+            # is a torn final write
+            pos = 0
+            while True:
+                end = data.find(b"\n", pos)
+                if end < 0:
+                    break
+                try:
+                    key, value = json.loads(data[pos:end])
+                except ValueError:
+                    break
+                dict.__setitem__(self, key, value)
+                self._journal_entries += 1
+                pos = end + 1
+
+            # Cut the torn tail off, or the next append would run into it and be lost too
+            if pos < len(data):
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(pos)
+
+    def set_aside(self) -> List[str]:
+        """
+        Moves unreadable cache files to <file>.corrupt, so the next checkpoint writes a
+        fresh snapshot instead of appending to them. Returns the paths moved.
+        """
+        return set_aside_files([self.path, self.journal_path])
+
+    def checkpoint(self) -> Optional[Callable[[], None]]:
+        """
+        Captures the changes since the last checkpoint on the calling thread and returns
+        a writer that persists them, or None if nothing changed. The writer never looks
+        at the live dict, so it can run off the event loop.
+        """
+        if self._journal_entries + len(self._dirty) > self.compact_after or (
+            self._dirty and not os.path.exists(self.path)
+        ):
+            snapshot = dict(self)
+            self._dirty = {}
+            self._journal_entries = 0
+
+            def compact():
+                _atomic_write(self.path, json.dumps(snapshot, ensure_ascii=False).encode("utf-8"))
+                # Everything journalled so far is in the snapshot now
+                open(self.journal_path, "wb").close()
+
+            return compact
+
+        if not self._dirty:
+            return None
+
+        changes, self._dirty = self._dirty, {}
+        self._journal_entries += len(changes)
+
+        def append():
+            lines = "".join(json.dumps([k, v], ensure_ascii=False) + "\n" for k, v in changes.items())
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+        return append
+
+    def save(self):
+        write_checkpoints([self.checkpoint()])
+
+
+def write_checkpoints(writers: Iterable[Optional[Callable[[], None]]]):
+    """Runs checkpoint writers one at a time; safe to call from a worker thread."""
+    with _write_lock:
+        for write in writers:
+            if write is not None:
+                write()
@@ -0,0 +1,116 @@
+"""
+Checks that the persistent caches survive a torn final write.
+
+    python check_caches.py
+
+A crash can leave the last journal line or log block half written. For each cache
+the file is torn a few ways, the cache is reloaded and saved again, and a second
+reload must see everything written before the tear and everything saved after it.
+Runs in a temporary directory and exits non-zero on the first failure.
+"""
+
+import os
+import sys
+import tempfile
+
+from typing import Callable, List
+from cache_store import JournalDict
+from tag_cache import ItemRecord, TagCache
+
+# -----------------------------
+# TEARS
+# -----------------------------
+
+def tear_newline(path: str):
+    """The last byte missing: for a journal, the final newline."""
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 1)
+
+def tear_midway(path: str):
+    """The last few bytes of the file missing."""
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+def tear_garbage(path: str):
+    """A partial write after the last complete one."""
+    with open(path, "ab") as f:
+        f.write(b'["half a li')
+
+TEARS: List[Callable[[str], None]] = [tear_newline, tear_midway, tear_garbage]
+
+# -----------------------------
+# JOURNALDICT
+# -----------------------------
+
+def check_journal(directory: str, tear: Callable[[str], None]):
+    path = os.path.join(directory, f"journal_{tear.__name__}.json")
+
+    cache = JournalDict(path)
+    cache["snapshot"] = 0
+    cache.save()  # the first save writes the snapshot, later ones append
+    cache.update({"kept": 1, "torn": 2})
+    cache.save()
+    tear(path + ".journal")
+
+    cache = JournalDict(path)
+    cache.load()
+    cache.update({"after_1": 3, "after_2": 4})
+    cache.save()
+
+    reloaded = JournalDict(path)
+    reloaded.load()
+    for key in ("snapshot", "kept", "after_1", "after_2"):
+        assert key in reloaded, f"{key!r} lost after {tear.__name__}: {dict(reloaded)}"
+
+# -----------------------------
+# TAGCACHE
+# -----------------------------
+
+def check_tag_cache(directory: str, tear: Callable[[str], None]):
+    path = os.path.join(directory, f"tags_{tear.__name__}.bin")
+
+    def key(name: str) -> bytes:
+        return TagCache.key_for(name)
+
+    cache = TagCache(path)
+    cache.put(key("compacted"), ItemRecord("COMPACTED", 1))
+    cache.save()  # the first save writes a compacted log, later ones append blocks
+    cache.put(key("kept"), ItemRecord("KEPT", 1))
+    cache.save()
+    cache.put(key("torn"), ItemRecord("TORN", 1))
+    cache.save()
+    tear(path)
+
+    cache = TagCache(path)
+    cache.load()
+    cache.put(key("after_1"), ItemRecord("AFTER_1", 2))
+    cache.save()
+    cache.put(key("after_2"), ItemRecord("AFTER_2", 3))
+    cache.save()
+
+    reloaded = TagCache(path)
+    reloaded.load()
+    for name in ("compacted", "kept", "after_1", "after_2"):
+        assert key(name) in reloaded, f"{name!r} lost after {tear.__name__}: {len(reloaded)} entries"
+
+# -----------------------------
+# ENTRY POINT
+# -----------------------------
+
+CHECKS = [check_journal, check_tag_cache]
+
+def main() -> int:
+    failed = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for check in CHECKS:
+            for tear in TEARS:
+                try:
+                    check(directory, tear)
+                    print(f"[Check] {check.__name__} / {tear.__name__}: ok")
+                except Exception as e:
+                    failed += 1
+                    print(f"[Check] {check.__name__} / {tear.__name__}: FAILED, {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
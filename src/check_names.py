@@ -0,0 +1,115 @@
+"""
+Cross-checks NameNormaliser against the word-by-word clean_name it replaced.
+
+    python check_names.py                       200k randomised names against Reforges.json
+    python check_names.py --count 1000000 --seed 7
+
+Names are built from reforge words, item words, star characters, perfect armour
+pieces and assorted whitespace, so the compiled prefix pattern is exercised on
+the cases where it could drift from splitting and popping words one at a time.
+Exits non-zero and prints the first mismatches if the two ever disagree.
+"""
+
+import sys
+import json
+import random
+import argparse
+
+from typing import Iterable, List, Set
+from name_normaliser import BANNED_CHARS, NameNormaliser
+
+# -----------------------------
+# REFERENCE
+# -----------------------------
+
+def reference_clean(name: str, reforges: Set[str]) -> str:
+    """The original clean_name from main.py, minus its cache."""
+    name = name.translate(str.maketrans("", "", BANNED_CHARS)).strip()
+    parts = name.split()
+    while parts and parts[0] in reforges:
+        parts.pop(0)
+    name = " ".join(parts)
+
+    hyphen = name.find("-", 5) > 0
+    for p in ["Helmet", "Chestplate", "Leggings", "Boots"]:
+        if name.startswith(p) and hyphen:
+            name = "Perfect " + name
+            break
+    return name
+
+# -----------------------------
+# RANDOM NAMES
+# -----------------------------
+
+ITEM_WORDS = [
+    "Hyperion", "Aspect", "of", "the", "Dragons", "Juju", "Shortbow", "Terminator", "Necron's",
+    "Chestplate", "Helmet", "Leggings", "Boots", "Perfect", "Wither", "Goggles", "Ring", "Talisman",
+    "Sharpness", "Fastidious", "Sharpened", "Epicness", "Very-Wise", "Tier", "XII", "-", "[Lvl 100]",
+    "§6Golden", "Dragon", "Pet", "Skin",
+]
+SPACES = [" ", " ", " ", "  ", "\t", "\n", " ", " ", "　", "\x1f"]
+
+def random_name(rng: random.Random, reforges: List[str]) -> str:
+    words = []
+    for _ in range(rng.choice([0, 1, 1, 1, 2, 3])):
+        word = rng.choice(reforges)
+        # Near misses: other casing, or a reforge glued to more letters
+        roll = rng.random()
+        if roll < 0.05:
+            word = word.lower()
+        elif roll < 0.1:
+            word += rng.choice(["s", "er", "-", "✪"])
+        words.append(word)
+
+    if rng.random() < 0.15:
+        piece = rng.choice(["Helmet", "Chestplate", "Leggings", "Boots"])
+        words += [piece, rng.choice(["-", "- Tier", "-Tier"]), rng.choice(["I", "XII", "XIII"])]
+    else:
+        words += rng.choices(ITEM_WORDS, k=rng.randint(0, 4))
+
+    name = ""
+    for word in words:
+        name += word + rng.choice(SPACES)
+    if rng.random() < 0.5:
+        name += rng.choice(BANNED_CHARS) * rng.randint(1, 5)
+    if rng.random() < 0.2:
+        name = rng.choice(SPACES) + name
+    return name if rng.random() < 0.7 else name.rstrip()
+
+def random_names(count: int, reforges: List[str], seed: int) -> Iterable[str]:
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield random_name(rng, reforges)
+
+# -----------------------------
+# ENTRY POINT
+# -----------------------------
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reforges", default="Reforges.json")
+    parser.add_argument("--count", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with open(args.reforges, "r") as f:
+        reforges = json.load(f).get("Reforges", [])
+    reforge_set = set(reforges)
+    normaliser = NameNormaliser(reforges, max_entries=args.count)
+
+    mismatches = []
+    checked = 0
+    for name in random_names(args.count, reforges, args.seed):
+        checked += 1
+        expected = reference_clean(name, reforge_set)
+        # Twice, so the memoised path is checked as well as the first computation
+        if normaliser.clean(name) != expected or normaliser.clean(name) != expected:
+            mismatches.append((name, expected, normaliser.clean(name)))
+
+    print(f"[Check] {checked} names, {len(mismatches)} mismatches, memo {normaliser.stats()}")
+    for name, expected, got in mismatches[:20]:
+        print(f"[Check] {name!r}: expected {expected!r}, got {got!r}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,48 +1,190 @@
-import requests
 import json
+import asyncio
+import aiohttp
 
-from PIL import Image
-from io import BytesIO
+from typing import Any, Dict, Iterable, List, Optional
+from thumbnail_cache import ThumbnailCache
 
 class DiscordNotifier:
-    def __init__(self, webhook_url: str):
+    """
+    Queues flip alerts and delivers them from a background worker, so finding a flip
+    never waits on Discord. Alerts that arrive together are batched into one webhook
+    message, and Discord's rate-limit headers are respected with retries.
+    """
+
+    MAX_EMBEDS = 10  # Discord's limit per webhook message
+    MAX_ATTEMPTS = 5
+    TIMEOUT = aiohttp.ClientTimeout(total=15)
+
+    def __init__(self, webhook_url: str, thumbnail_dir: str = "Cache\\thumbnails",
+                 queue_size: int = 200, batch_delay: float = 0.5,
+                 thumbnails: Optional[ThumbnailCache] = None):
         self.webhook_url = webhook_url
+        self.batch_delay = batch_delay
+        # Notifiers for different webhooks can share one cache
+        self.thumbnails = thumbnails if thumbnails is not None else ThumbnailCache(thumbnail_dir)
 
-    def _resize_image(self, url: str, size=(50, 50)) -> BytesIO:
-        resp = requests.get(url)
-        resp.raise_for_status()
-        img = Image.open(BytesIO(resp.content)).convert("RGBA")
-        img = img.resize(size, Image.Resampling.LANCZOS)
-        buf = BytesIO()
-        img.save(buf, format="PNG")
-        buf.seek(0)
-        return buf
-
-    def send_flip(self, name, profit, lowest, volume, uuid, itemURL):
-        try:
-            # Resize image
-            resized_buf = self._resize_image(itemURL, (50, 50))
-
-            embed = {
-                "title": "💰 Flip Found!",
-                "color": 0x2ECC71,
-                "fields": [
-                    {"name": "Item", "value": name, "inline": False},
-                    {"name": "Cost", "value": f"`{lowest:,}`", "inline": True},
-                    {"name": "Profit", "value": f"```ansi\n[32m{profit:,}[0m\n```", "inline": True},
-                    {"name": "Daily Volume", "value": f"`{volume:.2f}`", "inline": False},
-                    {"name": "Auction", "value": f"```/viewauction {uuid}                       ```", "inline": False}
-                ],
-                "thumbnail": {"url": "attachment://thumbnail.png"}
-            }
-
-
-            multipart_data = {
-                'payload_json': (None, json.dumps({"embeds": [embed]})),
-                'file': ('thumbnail.png', resized_buf, 'image/png')
-            }
-
-            requests.post(self.webhook_url, files=multipart_data)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._owns_session = False
+        self._worker: Optional[asyncio.Task] = None
+
+        self.sent = 0
+        self.dropped = 0
+
+    async def start(self, session: Optional[aiohttp.ClientSession] = None):
+        """Uses the given shared session if any; otherwise opens (and later closes) its own."""
+        if session is not None:
+            self._session = session
+            self._owns_session = False
+        elif self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+            self._owns_session = True
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+        self._session = None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    # -----------------------------
+    # QUEUEING
+    # -----------------------------
+
+    def send_flip(self, name, profit, lowest, volume, uuid, itemURL, warning=None) -> bool:
+        """Queues an alert and returns straight away. Must be called from the event loop."""
+        if not self.webhook_url:
+            return False
+
+        if self._worker is None or self._worker.done():
+            asyncio.get_running_loop().create_task(self.start())
+
+        alert = {
+            "name": name,
+            "profit": profit,
+            "lowest": lowest,
+            "volume": volume,
+            "uuid": uuid,
+            "itemURL": itemURL,
+            "warning": warning,
+        }
+        if self._queue.full():
+            # Fresh flips are worth more than stale ones, so make room at the old end
+            self._queue.get_nowait()
+            self.dropped += 1
+            print("[Discord] Alert queue full, dropped the oldest alert")
+        self._queue.put_nowait(alert)
+        return True
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+
+            # Give alerts from the same scan a moment to join this message
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.MAX_EMBEDS:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._deliver(batch)
+                self.sent += len(batch)
+            except Exception as e:
+                print("[Discord] Could not deliver alerts:", e)
 
+    # -----------------------------
+    # DELIVERY
+    # -----------------------------
+
+    async def _resize_image(self, url: str) -> Optional[bytes]:
+        try:
+            return await self.thumbnails.get(self._session, url)
         except Exception as e:
             print("[Thumbnail error] Could not process image:", e)
+            return None
+
+    async def prewarm_thumbnails(self, urls: Iterable[str]):
+        await self.start()
+        await self.thumbnails.prewarm(self._session, urls)
+
+    @staticmethod
+    def _build_embed(alert: Dict[str, Any], thumbnail: Optional[str]) -> Dict[str, Any]:
+        embed = {
+            "title": "💰 Flip Found!",
+            "color": 0x2ECC71,
+            "fields": [
+                {"name": "Item", "value": alert["name"], "inline": False},
+                {"name": "Cost", "value": f"`{alert['lowest']:,}`", "inline": True},
+                {"name": "Profit", "value": f"```ansi\n[32m{alert['profit']:,}[0m\n```", "inline": True},
+                {"name": "Daily Volume", "value": f"`{alert['volume']:.2f}`", "inline": False},
+                {"name": "Auction", "value": f"```/viewauction {alert['uuid']}                       ```", "inline": False}
+            ],
+        }
+        if alert.get("warning"):
+            embed["color"] = 0xE67E22
+            embed["footer"] = {"text": f"⚠ {alert['warning']}"}
+        if thumbnail:
+            embed["thumbnail"] = {"url": f"attachment://{thumbnail}"}
+        return embed
+
+    async def _deliver(self, batch: List[Dict[str, Any]]):
+        thumbnails = await asyncio.gather(*(self._resize_image(alert["itemURL"]) for alert in batch))
+
+        embeds = []
+        files = []
+        for i, (alert, png) in enumerate(zip(batch, thumbnails)):
+            filename = f"thumbnail_{i}.png" if png else None
+            if png:
+                files.append((filename, png))
+            embeds.append(self._build_embed(alert, filename))
+
+        await self._post({"embeds": embeds}, files)
+
+    async def _post(self, payload: Dict[str, Any], files: List[tuple]):
+        for attempt in range(self.MAX_ATTEMPTS):
+            form = aiohttp.FormData()
+            form.add_field("payload_json", json.dumps(payload), content_type="application/json")
+            for i, (filename, png) in enumerate(files):
+                form.add_field(f"files[{i}]", png, filename=filename, content_type="image/png")
+
+            async with self._session.post(self.webhook_url, data=form, timeout=self.TIMEOUT) as resp:
+                if resp.status == 429:
+                    retry_after = float(resp.headers.get("Retry-After", 1))
+                    try:
+                        retry_after = float((await resp.json()).get("retry_after", retry_after))
+                    except Exception:
+                        pass
+                    print(f"[Discord] Rate limited, retrying in {retry_after:.2f}s")
+                    await asyncio.sleep(retry_after)
+                    continue
+
+                if resp.status >= 500:
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+
+                resp.raise_for_status()
+
+                # Out of requests in this bucket: wait for it to reset before the next message
+                if resp.headers.get("X-RateLimit-Remaining") == "0":
+                    await asyncio.sleep(float(resp.headers.get("X-RateLimit-Reset-After", 1)))
+                return
+
+        raise RuntimeError(f"Gave up after {self.MAX_ATTEMPTS} attempts")
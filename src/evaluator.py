@@ -0,0 +1,56 @@
+import math
+
+from typing import Dict, Iterable, List, Mapping, Tuple
+from market import OrderBook
+from profiles import Profile, Thresholds
+
+# The flip checks, kept free of I/O so live scans (main.py) and replays (replay.py)
+# run exactly the same code. A candidate is
+#   (item_id, lowest entry, second entry, lowest price, second price, profit, lowest uuid)
+
+def select_candidates(groups: Mapping[str, OrderBook], changed: Iterable[str], medians: Dict[str, float],
+                      limits: Thresholds) -> List[tuple]:
+    """
+    Checks each changed item's two cheapest BINs against the loosest profile limits.
+    Runs once per scan however many profiles there are; match_profiles narrows it down.
+    """
+    candidates = []
+
+    for item_id in changed:
+        book = groups.get(item_id)
+        if book is None or len(book) < limits.min_listings:
+            continue
+
+        a1, a2 = book.top_two()
+
+        lowest = a1.price
+        second = a2.price
+
+        # The second-lowest BIN can be an outlier; the typical price caps it
+        median = medians.get(item_id, math.nan)
+        resale = second if math.isnan(median) else min(second, int(median))
+        profit = resale - lowest
+
+        required_profit = max(limits.min_profit, lowest * (limits.min_profit_percentage / 100))
+
+        if profit >= required_profit and lowest <= limits.max_cost:
+
+            # REQUIRE: both lowest and second-lowest BIN to be single items (count == 1)
+            if a1.count != 1 or a2.count != 1:
+                continue
+
+            candidates.append((item_id, a1, a2, lowest, second, profit, a1.uuid))
+
+    return candidates
+
+def match_profiles(groups: Mapping[str, OrderBook], candidates: List[tuple],
+                   profiles: List[Profile]) -> List[Tuple[Profile, tuple]]:
+    """Pairs every candidate with each profile whose own limits it meets and that hasn't alerted it yet."""
+    matches = []
+    for item in candidates:
+        item_id, a1, _, lowest, _, profit, uid = item
+        listings = len(groups[item_id])
+        for profile in profiles:
+            if uid not in profile.sent_uuids and profile.accepts(item_id, a1.category, listings, lowest, profit):
+                matches.append((profile, item))
+    return matches
@@ -0,0 +1,147 @@
+import time
+import aiohttp
+
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+class HostStats:
+    __slots__ = ("requests", "errors", "new_connections", "reused_connections",
+                 "dns_hits", "dns_misses", "latency_total", "latency_max")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        done = max(1, self.requests - self.errors)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "dns_hits": self.dns_hits,
+            "dns_misses": self.dns_misses,
+            "avg_latency_ms": round(self.latency_total / done * 1000, 1),
+            "max_latency_ms": round(self.latency_max * 1000, 1),
+        }
+
+class HttpClient:
+    """
+    The one aiohttp session the whole process shares, created by the main loop and
+    kept open across scans.
+
+    aiohttp's connector already keeps a separate keepalive pool per (host, port, TLS)
+    and caps each with `limit_per_host`, so Hypixel page bursts can't starve coflnet
+    or Discord of connections. Connections are kept alive longer than the scan
+    cooldown and DNS answers are cached, so a steady-state scan opens nothing new.
+    Responses are requested compressed and decompressed transparently.
+    Per-host request, connection, DNS and latency counters come from trace hooks.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 20, keepalive_timeout: float = 60,
+                 dns_ttl: int = 600, timeout: Optional[aiohttp.ClientTimeout] = None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        self.timeout = timeout or aiohttp.ClientTimeout(total=60, sock_connect=10, sock_read=20)
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._hosts: Dict[str, HostStats] = defaultdict(HostStats)
+
+    # -----------------------------
+    # LIFECYCLE
+    # -----------------------------
+
+    async def start(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+                enable_cleanup_closed=True,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={"Accept-Encoding": "gzip, deflate"},
+                trace_configs=[self._trace_config()],
+            )
+        return self._session
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HttpClient.start() has not been awaited")
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "HttpClient":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # -----------------------------
+    # STATS
+    # -----------------------------
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+        hosts = self._hosts
+
+        async def on_request_start(session, ctx: SimpleNamespace, params):
+            ctx.host = params.url.host
+            ctx.start = time.perf_counter()
+            hosts[ctx.host].requests += 1
+
+        async def on_request_end(session, ctx: SimpleNamespace, params):
+            elapsed = time.perf_counter() - ctx.start
+            stats = hosts[ctx.host]
+            stats.latency_total += elapsed
+            stats.latency_max = max(stats.latency_max, elapsed)
+
+        async def on_request_exception(session, ctx: SimpleNamespace, params):
+            hosts[ctx.host].errors += 1
+
+        async def on_connection_create_end(session, ctx: SimpleNamespace, params):
+            hosts[ctx.host].new_connections += 1
+
+        async def on_connection_reuseconn(session, ctx: SimpleNamespace, params):
+            hosts[ctx.host].reused_connections += 1
+
+        async def on_dns_cache_hit(session, ctx: SimpleNamespace, params):
+            hosts[params.host].dns_hits += 1
+
+        async def on_dns_cache_miss(session, ctx: SimpleNamespace, params):
+            hosts[params.host].dns_misses += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_request_exception.append(on_request_exception)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
+
+    def stats(self, url: Optional[str] = None) -> Dict[str, Any]:
+        """Counters for one host (given any URL on it), or for every host."""
+        if url is not None:
+            return self._hosts[urlparse(url).hostname].as_dict()
+        return {host: stats.as_dict() for host, stats in self._hosts.items()}
@@ -1,376 +1,808 @@
-import json
-import asyncio
-import aiohttp
 import time
+
+# Taken before anything else is imported, for the startup breakdown
+_PROCESS_START = time.perf_counter()
+
+import asyncio
 import os
-import gzip
 import atexit
-import hashlib
-
-from collections import defaultdict, deque
-from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, List, Any, Optional, Union
-from NBT_Decoder import ItemDecoder
+import math
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Any, Optional, Set
+from NBT_Decoder import decode_fields, decode_batch
+from tag_cache import TagCache, ItemRecord
+from cache_store import JournalDict, write_checkpoints
+from market import Listing, MarketState
+from volume_service import VolumeService
+from evaluator import match_profiles, select_candidates
 from discord_notify import DiscordNotifier
-from aiohttp import ClientSession, TCPConnector
+from thumbnail_cache import ThumbnailCache
+from profiles import Profile, Thresholds, load_profiles, load_settings
+from rate_limiter import limiter_for, limiter_stats, retry_after
+from http_client import HttpClient
+from IconsCacher import IconIndexer
+from page_parser import Auction, Page, JSON_BACKEND, loads, parse_page
+from metrics import Metrics, memory_mb, reset_peak_rss
+from name_normaliser import NameNormaliser
+from aiohttp import ClientSession
+
+_IMPORTED = time.perf_counter()
 
 # -----------------------------
 # CONFIG AND SETTINGS
 # -----------------------------
+#
+# The values here are the defaults; configure() reads the settings file over them
+# and builds everything that depends on it. Importing this module reads no files and
+# starts nothing, which matters because every decode worker re-imports it when the
+# pool spawns its processes.
+
+data: Dict[str, Any] = {}
+
+# Optional: every *.json in this folder is an extra profile with its own thresholds,
+# categories, blacklist and webhook, all evaluated against the same scan
+PROFILES_DIR = "Profiles"
+PROFILES: List[Profile] = []
+
+# Loosest limits across profiles; the market holds every category any profile wants
+LIMITS: Optional[Thresholds] = None
+ALLOWED_CATEGORIES: List[str] = []
+
+# Optional: point at a local stand-in (see mock_api.py) and toggle delta scans
+HYPIXEL_API = "https://api.hypixel.net"
+COFLNET_API = "https://sky.coflnet.com"
+
+# Optional: "local" gates on sales seen in our own history once enough is recorded
+VOLUME_SOURCE = "coflnet"
+# Optional: "median" caps the resale price at the item's median lowest BIN over the last day
+RESALE_ESTIMATE = "second_lowest"
+INCREMENTAL_SCANS = True
+# Optional: what to do with flips from a scan that lost pages, "suppress" or "flag"
+INCOMPLETE_SCANS = "suppress"
+
+# Optional: render every known icon's thumbnail in the background at startup
+PREWARM_THUMBNAILS = False
+# Optional: append every scan to this scan log for replay.py
+RECORD_SCANS: Optional[str] = None
+# Optional: look up icons for every tracked item in the background, not just when a flip needs one
+INDEX_ICONS = True
+# Optional: time every scan stage, log one JSON line per scan and serve the rolling
+# figures on http://127.0.0.1:<port>/metrics
+METRICS_PORT: Optional[int] = None
+
+metrics = Metrics()
+
+thumbnails: Optional[ThumbnailCache] = None
+
+# Display names are memoised in memory only: cleaning is cheap next to reading a
+# cache file, and Reforges.json edits take effect on restart
+name_normaliser: Optional[NameNormaliser] = None
 
-def parseSettingsValue(v: str) -> float:
-    if "." in v:
-        return float(v.replace(",", ""))
-    else:
-        return int(v.replace(",", ""))
-    
-def parsePercent(v: str) -> Union[int, float]:
-    formatted = v
-
-    for char in formatted:
-        if char == "%":
-            formatted = formatted.replace("%", "")
-
-    if "." in formatted:
-        return float(formatted)
-    
-    return int(formatted)
-
-
-if os.path.exists("PRIVATE_SETTINGS.json"):
-    with open("PRIVATE_SETTINGS.json", "r") as file:
-        data = json.load(file)
-        print("Loaded PRIVATE_SETTINGS...")
-else:
-    with open("Settings.json", "r") as file:
-        data = json.load(file)
-        print("Loaded Settings...")
-
-ALLOWED_CATEGORIES = set(data["ALLOWED_CATEGORIES"])
-BLACKLISTED_TAGS = data["BLACKLISTED_TAGS"]
-WEBHOOK_URL = data["WEBHOOK_URL"]
+# -----------------------------
+# PERSISTENT CACHES
+# -----------------------------
 
-MIN_PROFIT = parseSettingsValue(data["Profit"]["MinProfit"])
-MinProfitPercentage = parsePercent(data["Profit"]["MinProfitPercentage"])  # The min profit in % of the item's cost
+tag_cache_path = "Cache\\tag_cache"
+item_icons_path = "Cache\\item_icons.json"
+volume_cache_path = "Cache\\volume_cache.json"
+price_history_path = "Cache\\price_history.npz"
 
-MAX_COST = parseSettingsValue(data["MAX_COST"])
-MIN_LISTINGS = parseSettingsValue(data["MIN_LISTINGS"])
-MIN_DAILY_VOLUME = parseSettingsValue(data["MIN_DAILY_VOLUME"])
+TAG_CACHE_MAX_ENTRIES = 200_000
+TAG_CACHE_MAX_AGE = 7 * 24 * 3600  # seconds
 
-notifier = DiscordNotifier(WEBHOOK_URL)
+_tag_cache = TagCache(tag_cache_path + ".bin", max_entries=TAG_CACHE_MAX_ENTRIES, max_age=TAG_CACHE_MAX_AGE)
+_icons_cache = JournalDict(item_icons_path)
 
-with open("Reforges.json", "r") as f:
-    REFORGES = set(json.load(f).get("Reforges", []))
+# Fills _icons_cache in the background from the ids scans have already decoded;
+# the auto-save checkpoints it like any other cache. Built by configure()
+icon_indexer: Optional[IconIndexer] = None
+ICON_INDEX_INTERVAL = 60  # seconds
+# The indexer shares coflnet's limiter with volume lookups, which scans wait on: it gets
+# at most this many requests/s and only while half the limiter's burst is unused
+ICON_INDEX_MAX_RATE = 2.0
+ICON_INDEX_RESERVE = 0.5
 
 # -----------------------------
-# PERSISTENT CACHES
+# ITEM DECODING
 # -----------------------------
 
-_name_cache: Dict[str, str] = {}
-_tag_cache: Dict[str, str] = {}
-_icons_cache: Dict[str, str] = {}
+# NBT fields backing ItemRecord, in the same order
+DECODE_FIELDS = ("SkyBlock_id", "Count")
 
-name_cache_path = "Cache\\name_cache.json"
-tag_cache_path = "Cache\\tag_cache"
-item_icons_path = "Cache\\item_icons.json"
+def get_item_hash(item_bytes: Any) -> bytes:
+    return TagCache.key_for(item_bytes)
 
-# -----------------------------
-# HASH FUNCTION
-# -----------------------------
+def _to_record(values: Optional[tuple]) -> Optional[ItemRecord]:
+    if values is None or values[0] is None:
+        return None
+    return ItemRecord(*values)
 
-def get_item_hash(item_bytes: Any) -> str:
-    if isinstance(item_bytes, str):
-        item_bytes = item_bytes.encode('utf-8')
-    return hashlib.sha256(item_bytes).hexdigest()
+def decode_item(item_bytes: Any) -> Optional[ItemRecord]:
+    return _to_record(decode_fields(item_bytes, DECODE_FIELDS))
 
-def get_item_id(item_bytes: Any) -> Optional[str]:
+def get_item_record(item_bytes: Any) -> Optional[ItemRecord]:
     if item_bytes is None:
         return None
 
     key = get_item_hash(item_bytes)
-    if key in _tag_cache:
-        return _tag_cache[key]
-
-    try:
-        decoded = ItemDecoder.decode(item_bytes)
-        tag = decoded.get("SkyBlock_id")
-    except Exception:
-        tag = None
+    record = _tag_cache.get(key)
+    if record is not None:
+        return record
 
-    if tag is not None:
-        _tag_cache[key] = tag
-    return tag
+    record = decode_item(item_bytes)
+    if record is not None:
+        _tag_cache.put(key, record)
+    return record
 
-def get_item_count(item_bytes):
-    if item_bytes is None:
-        return None
-    try:
-        decoded = ItemDecoder.decode(item_bytes)
-        return decoded.get("Count")
-    except Exception:
-        return None
+# -----------------------------
+# DECODE POOL
+# -----------------------------
 
-def get_item_ids_batch(item_bytes_list: List[Any]) -> List[Optional[str]]:
-    return [get_item_id(item_bytes) for item_bytes in item_bytes_list]
+DECODE_WORKERS = os.cpu_count() or 1
+DECODE_BATCH_SIZE = 128
+
+_decode_pool: Optional[ProcessPoolExecutor] = None
+
+def get_decode_pool() -> ProcessPoolExecutor:
+    """The long-lived worker pool every scan decodes on, created once on first use."""
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ProcessPoolExecutor(max_workers=DECODE_WORKERS)
+        atexit.register(_decode_pool.shutdown, cancel_futures=True)
+    return _decode_pool
+
+async def start_decode_pool():
+    """Spawns every worker now rather than when the first batches arrive."""
+    start = time.perf_counter()
+    pool = get_decode_pool()
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(pool, decode_batch, [], DECODE_FIELDS)
+        for _ in range(DECODE_WORKERS)
+    ))
+    print(f"[Decode] Started {DECODE_WORKERS} decode workers, parsing pages with {JSON_BACKEND}")
+    startup["decode workers (background)"] = time.perf_counter() - start
+
+async def decode_records(item_bytes_list: List[Any]) -> List[Optional[ItemRecord]]:
+    """
+    Resolves records from the tag cache and decodes only the misses, spread over the
+    pool in small batches so a single page keeps several workers busy.
+    """
+    records: List[Optional[ItemRecord]] = [None] * len(item_bytes_list)
+    misses = []
+
+    for i, item_bytes in enumerate(item_bytes_list):
+        if item_bytes is None:
+            continue
+        key = get_item_hash(item_bytes)
+        record = _tag_cache.get(key)
+        if record is not None:
+            records[i] = record
+        else:
+            misses.append((i, key))
+
+    metrics.count("tag_lookups", len(item_bytes_list))
+    if not misses:
+        return records
+
+    pool = get_decode_pool()
+    loop = asyncio.get_running_loop()
+    batches = [misses[j:j + DECODE_BATCH_SIZE] for j in range(0, len(misses), DECODE_BATCH_SIZE)]
+    metrics.count("decoded", len(misses))
+    metrics.peak("decode_batches_queued", len(batches))
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, decode_batch, [item_bytes_list[i] for i, _ in batch], DECODE_FIELDS)
+        for batch in batches
+    ))
+
+    for batch, values in zip(batches, results):
+        for (i, key), item_values in zip(batch, values):
+            record = _to_record(item_values)
+            if record is not None:
+                _tag_cache.put(key, record)
+                records[i] = record
+
+    return records
 
 # -----------------------------
 # LOAD / SAVE CACHES
 # -----------------------------
 
-def load_caches():
-    if os.path.exists(name_cache_path):
-        try:
-            with open(name_cache_path, "r") as f:
-                _name_cache.update(json.load(f))
-        except:
-            print("[Cache] Failed to load name_cache.json")
+#
+# Caches load on worker threads while the first scan is already running. Each one is
+# used, and checkpointed, only once its load has finished; the scan waits for a cache
+# at the point it first needs it. The tag cache never holds a scan up: decodes go into
+# a fresh cache until the stored one has loaded, and are then merged into it.
+
+_warmups: Dict[str, asyncio.Task] = {}
+_warmed: Set[str] = set()
+
+def _load_tag_cache() -> TagCache:
+    tags = TagCache(tag_cache_path + ".bin", max_entries=TAG_CACHE_MAX_ENTRIES, max_age=TAG_CACHE_MAX_AGE)
+    tags.load(legacy_gz_path=tag_cache_path + ".gz")
+    return tags
+
+def _adopt_tag_cache(loaded: TagCache):
+    global _tag_cache
+    loaded.merge(_tag_cache)
+    _tag_cache = loaded
+    print(f"[Cache] Loaded {len(_tag_cache):,} tags")
+
+def _load_history() -> "PriceHistory":
+    from price_history import PriceHistory
+    loaded = PriceHistory(price_history_path)
+    try:
+        loaded.load()
+    except Exception as e:
+        # Start from an empty history rather than none at all
+        print(f"[Cache] Failed to load price_history.npz: {e}")
+    return loaded
 
-    gz_path = tag_cache_path + ".gz"
-    if os.path.exists(gz_path):
-        try:
-            with gzip.open(gz_path, "rt", encoding="utf-8") as f:
-                _tag_cache.update(json.load(f))
-        except:
-            print("[Cache] Failed to load tag_cache.gz")
+def _adopt_history(loaded: "PriceHistory"):
+    global history
+    history = loaded
 
-    if os.path.exists(item_icons_path):
-        try:
-            with open(item_icons_path, "r") as f:
-                _icons_cache.update(json.load(f))
-        except:
-            print("[Cache] Failed to load item_icons.json")
+def _load_recorder() -> Optional[Exception]:
+    try:
+        recorder.load()
+    except Exception as e:
+        return e
+    return None
+
+def _adopt_recorder(error: Optional[Exception]):
+    global recorder
+    if error is not None:
+        print(f"[Record] Failed to read {RECORD_SCANS}, not recording: {error}")
+        recorder = None
+
+async def _warm(name: str, load: Callable[[], Any], adopt: Optional[Callable[[Any], None]] = None,
+                reset: Optional[Callable[[], List[str]]] = None):
+    """
+    Loads a cache off the loop. Only a cache that loaded counts as warmed, and so gets
+    checkpointed; one that failed to load is set aside by `reset` and starts afresh,
+    so it isn't appended to a file that can't be read back.
+    """
+    start = time.perf_counter()
+    try:
+        result = await asyncio.to_thread(load)
+        if adopt is not None:
+            adopt(result)
+        _warmed.add(name)
+    except Exception as e:
+        if reset is None:
+            print(f"[Cache] Failed to load {name}, not saving it this session: {e}")
+        else:
+            moved = await asyncio.to_thread(reset)
+            print(f"[Cache] Failed to load {name}, starting it afresh ({', '.join(moved) or 'nothing'} set aside as .corrupt): {e}")
+            _warmed.add(name)
+    startup[f"{name} (background)"] = time.perf_counter() - start
+
+def start_cache_warmup():
+    # History and the recorder deal with their own load failures
+    loads = {
+        "tags": (_load_tag_cache, _adopt_tag_cache, lambda: _tag_cache.set_aside()),
+        "icons": (_icons_cache.load, None, _icons_cache.set_aside),
+        "volumes": (volumes.load, None, volumes.set_aside),
+        "history": (_load_history, _adopt_history, None),
+    }
+    if recorder is not None:
+        loads["recorder"] = (_load_recorder, _adopt_recorder, None)
+    for name, (load, adopt, reset) in loads.items():
+        _warmups[name] = asyncio.create_task(_warm(name, load, adopt, reset))
+
+async def caches_ready(*names: str):
+    """Waits for the named caches to finish loading. Caches never warmed up count as ready."""
+    for name in names:
+        task = _warmups.get(name)
+        if task is not None:
+            await asyncio.shield(task)
+
+async def after_warmup(names: tuple, start: Callable[[], Any]):
+    """Runs a background task once the caches it reads have loaded."""
+    await caches_ready(*names)
+    await start()
+
+def checkpoint_caches() -> list:
+    """Captures pending changes of every loaded cache; must run on the event loop thread."""
+    caches = {"tags": _tag_cache, "icons": _icons_cache, "volumes": volumes, "history": history}
+    return [cache.checkpoint() for name, cache in caches.items() if name in _warmed]
 
 def save_caches():
     try:
-        with open(name_cache_path, "w") as f:
-            json.dump(_name_cache, f, indent=4)
-        with gzip.open(tag_cache_path + ".gz", "wt", encoding="utf-8") as f:
-            json.dump(_tag_cache, f)
-        with open(item_icons_path, "w") as f:
-            json.dump(_icons_cache, f, indent=4)
+        write_checkpoints(checkpoint_caches())
     except Exception as e:
         print(f"[Cache] Failed: {e}")
 
-atexit.register(save_caches)
-load_caches()
-
 async def auto_save_cache_task():
     while True:
         await asyncio.sleep(300)
-        save_caches()
+        try:
+            # Only the capture runs on the loop; file I/O and compaction happen in a thread
+            await asyncio.to_thread(write_checkpoints, checkpoint_caches())
+        except Exception as e:
+            print(f"[Cache] Failed: {e}")
 
 # -----------------------------
 # HELPER FUNCTIONS
 # -----------------------------
 
 def clean_name(name: str) -> str:
-    if name in _name_cache:
-        return _name_cache[name]
-
-    if not hasattr(clean_name, 'banned_chars'):
-        clean_name.banned_chars = str.maketrans('', '', "✪✿⚚✦➊➋➌➍➎")
-
-    name = name.translate(clean_name.banned_chars).strip()
-    parts = name.split()
-    while parts and parts[0] in REFORGES:
-        parts.pop(0)
-    name = " ".join(parts)
-
-    hyphen = name.find("-", 5) > 0
-    for p in ["Helmet", "Chestplate", "Leggings", "Boots"]:
-        if name.startswith(p) and hyphen:
-            name = "Perfect " + name
-            break
-
-    _name_cache[name] = name
-    return name
+    return name_normaliser.clean(name)
 
 # -----------------------------
 # AUCTION FETCHING
 # -----------------------------
 
-async def fetch_page(session: ClientSession, page: int, semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
-    async with semaphore:
-        try:
-            url = f"https://api.hypixel.net/v2/skyblock/auctions?page={page}"
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return data.get("auctions", [])
-                elif resp.status == 429:
-                    await asyncio.sleep(1)
-                    return []
-                else:
-                    return []
-        except Exception:
-            return []
-
-async def fetch_bins_async() -> Dict[str, List[Dict[str, Any]]]:
-    grouped = defaultdict(list)
-    connector = TCPConnector(limit=50, limit_per_host=10, keepalive_timeout=30)
-    timeout = aiohttp.ClientTimeout(total=120, sock_connect=10, sock_read=20)
-
-    async with ClientSession(connector=connector, timeout=timeout) as session:
-        async with session.get("https://api.hypixel.net/v2/skyblock/auctions") as meta_resp:
-            meta = await meta_resp.json()
-            total_pages = meta.get("totalPages", 0)
-
-        semaphore = asyncio.Semaphore(15)
-        tasks = [fetch_page(session, i, semaphore) for i in range(total_pages)]
-        all_pages = await asyncio.gather(*tasks, return_exceptions=True)
-        all_auctions = []
-        for page in all_pages:
-            if isinstance(page, list):
-                all_auctions.extend(page)
-
-        filtered_auctions = [
-            auc for auc in all_auctions
-            if auc.get("bin") and auc.get("category") in ALLOWED_CATEGORIES
-        ]
-
-        CHUNK_SIZE = 500
-        for i in range(0, len(filtered_auctions), CHUNK_SIZE):
-            chunk = filtered_auctions[i:i + CHUNK_SIZE]
-            item_bytes_chunk = [auc.get("item_bytes") for auc in chunk]
-
-            loop = asyncio.get_event_loop()
-            with ThreadPoolExecutor(max_workers=4) as executor:
-                item_ids = await loop.run_in_executor(
-                    executor, get_item_ids_batch, item_bytes_chunk
-                )
+AUCTIONS_URL = f"{HYPIXEL_API}/v2/skyblock/auctions"
+AUCTIONS_ENDED_URL = f"{HYPIXEL_API}/v2/skyblock/auctions_ended"
+
+FULL_RESYNC_INTERVAL = 600  # seconds; also picks up cancelled auctions the ended feed never reports
+
+SCAN_DEADLINE = 20  # seconds a scan may spend retrying failed pages
+PAGE_RETRY_DELAY = 0.5  # seconds before the first retry round, doubling each round
+
+market = MarketState()
+
+# parse_page drops everything outside these on the worker, before it reaches the loop
+PAGE_CATEGORIES: frozenset = frozenset()
+
+# price_history and scan_log pull in numpy, so both are imported where they are first
+# built rather than by every import of main (and every spawned decode worker)
+recorder: Optional["ScanRecorder"] = None
 
-            for auc, item_id in zip(chunk, item_ids):
-                full_name = auc["item_name"]
-                display_name = clean_name(full_name)
-                price = auc["starting_bid"]
-                uuid = auc["uuid"]
+# Shared by every request the process makes; see HttpClient
+http = HttpClient(limit=100, limit_per_host=20, keepalive_timeout=60)
 
-                if not item_id:
-                    item_id = f"UNKNOWN::{display_name}"
+async def fetch_raw(session: ClientSession, url: str) -> Optional[bytes]:
+    """GETs the raw body through the host's shared rate limiter. None on any failure."""
+    limiter = limiter_for(url)
+    await limiter.acquire()
+    try:
+        async with session.get(url) as resp:
+            if resp.status == 200:
+                raw = await resp.read()
+                limiter.on_success()
+                return raw
+            if resp.status == 429:
+                limiter.on_throttle(retry_after(resp.headers))
+                metrics.count("throttled")
+            else:
+                metrics.count("request_errors")
+            return None
+    except Exception:
+        metrics.count("request_errors")
+        return None
 
-                entry = {
-                    "price": price,
-                    "uuid": uuid,
-                    "full_name": full_name,
-                    "display_name": display_name,
-                    "item_bytes": auc.get("item_bytes"),
-                    "id": item_id,
-                }
+async def fetch_json(session: ClientSession, url: str) -> Optional[Dict[str, Any]]:
+    """For small responses; auction pages go through fetch_page instead."""
+    raw = await fetch_raw(session, url)
+    if raw is None:
+        return None
+    try:
+        return loads(raw)
+    except ValueError:
+        return None
 
-                grouped[item_id].append(entry)
+async def parse_page_async(raw: bytes) -> Optional[Page]:
+    """Parses a page on the worker pool, so the event loop only ever sees the slim result."""
+    loop = asyncio.get_running_loop()
+    try:
+        with metrics.stage("parse"):
+            return await loop.run_in_executor(get_decode_pool(), parse_page, raw, PAGE_CATEGORIES)
+    except ValueError:
+        return None
 
-    return dict(grouped)
+async def fetch_page(session: ClientSession, page: int, semaphore: asyncio.Semaphore,
+                     stage: str = "page_fetch") -> Optional[Page]:
+    """A parsed page, or None when it couldn't be fetched (a Page with no auctions is a real, empty page)."""
+    async with semaphore:
+        with metrics.stage(stage):
+            raw = await fetch_raw(session, f"{AUCTIONS_URL}?page={page}")
+    if raw is None:
+        return None
+    return await parse_page_async(raw)
+
+async def fetch_pages(session: ClientSession, page_nums: List[int], handle, semaphore: asyncio.Semaphore,
+                      deadline: float) -> List[int]:
+    """
+    Fetches the pages and passes each to `handle(page_num, page)` as it arrives.
+    Pages that fail go back on a retry queue, retried in rounds with growing delays
+    until they arrive or the scan's deadline (time.monotonic()) would pass.
+    Returns the page numbers that never arrived.
+    """
+    async def attempt(page_num: int) -> Optional[int]:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return page_num
+        try:
+            # Waiting on the rate limiter counts against the deadline too
+            page = await asyncio.wait_for(fetch_page(session, page_num, semaphore), remaining)
+        except asyncio.TimeoutError:
+            page = None
+        if page is None:
+            return page_num
+        await handle(page_num, page)
+        return None
+
+    pending = list(page_nums)
+    delay = PAGE_RETRY_DELAY
+    while True:
+        failed = [n for n in await asyncio.gather(*(attempt(n) for n in pending)) if n is not None]
+        metrics.count("page_failures", len(failed))
+        if not failed or time.monotonic() + delay >= deadline:
+            return failed
+        print(f"[API] Retrying {len(failed)} page(s) in {delay:.1f}s")
+        await asyncio.sleep(delay)
+        delay *= 2
+        pending = failed
+
+def _build_entries(chunk: List[Auction], records: List[Optional[ItemRecord]]):
+    """Market listings for a chunk; the item_bytes end with the chunk, only the decoded fields live on."""
+    for auc, record in zip(chunk, records):
+        if record is not None:
+            item_id, count = record
+        else:
+            # Only undecodable items are grouped by their cleaned display name
+            item_id, count = f"UNKNOWN::{name_normaliser.clean(auc.item_name)}", None
+
+        yield Listing(auc.starting_bid, auc.uuid, auc.item_name, item_id, count, auc.category)
+
+async def _ingest_page(page: Page) -> Set[str]:
+    """Decodes and adds a page's unseen BINs to the market. Returns the item ids touched."""
+    seen = market.seen
+    with metrics.stage("filter"):
+        # Non-BINs and unwanted categories were already dropped by parse_page
+        chunk = [auc for auc in page.auctions if auc.uuid not in seen]
+        seen.update(page.uuids)
+    del page
+    if not chunk:
+        return set()
+
+    with metrics.stage("decode"):
+        records = await decode_records([auc.item_bytes for auc in chunk])
+    with metrics.stage("grouping"):
+        return {market.add(entry) for entry in _build_entries(chunk, records)}
+
+async def fetch_bins_async(session: ClientSession, first: Page, sold: Set[str] = frozenset(),
+                           deadline: Optional[float] = None) -> Set[str]:
+    """
+    Full scan: rebuilds the market from every auction page.
+    Each page is parsed on the worker pool, then decoded and folded in as soon as it
+    arrives, so parsing and decoding overlap the remaining page downloads.
+    Page 0 is the meta response itself, so it isn't downloaded twice.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + SCAN_DEADLINE
+
+    previous = market.reset()
+    semaphore = asyncio.Semaphore(15)
+    total_pages = first.meta.get("totalPages", 0)
+
+    async def handle(page_num: int, page: Page):
+        await _ingest_page(page)
+
+    await _ingest_page(first)
+    missing = await fetch_pages(session, list(range(1, total_pages)), handle, semaphore, deadline)
+    market.completeness = 1 - len(missing) / total_pages if total_pages else 1.0
+
+    if missing:
+        # Listings on the missing pages are absent from the market until the next full sync
+        print(f"[API] {len(missing)} of {total_pages} pages never arrived: {sorted(missing)[:10]}")
+        return set(market.groups)
+
+    market.last_full_sync = time.time()
+
+    # Listings that vanished without showing up in the ended feed were cancelled (or
+    # sold while the feed wasn't being watched)
+    if market.last_updated is not None:
+        for uuid, item_id in previous.items():
+            if uuid not in market and uuid not in sold:
+                history.note_removed(item_id)
+
+    return set(market.groups)
+
+async def update_bins_async(session: ClientSession, first: Page, sold: List[str],
+                            deadline: Optional[float] = None) -> Set[str]:
+    """
+    Delta scan: removes the auctions that just sold, then walks pages from newest
+    until one holds nothing we haven't seen, adding only the new listings.
+    A page that can't be fetched in time ends the walk and marks the scan incomplete.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + SCAN_DEADLINE
+
+    changed = set()
+
+    for uuid in sold:
+        item_id = market.remove(uuid)
+        if item_id is not None:
+            changed.add(item_id)
+
+    semaphore = asyncio.Semaphore(1)
+    market.completeness = 1.0
+    pages = []
+
+    async def handle(page_num: int, page: Page):
+        pages.append(page)
+
+    for page_num in range(first.meta.get("totalPages", 0)):
+        if page_num == 0:
+            page = first
+        else:
+            pages.clear()
+            if await fetch_pages(session, [page_num], handle, semaphore, deadline):
+                market.completeness = page_num / (page_num + 1)
+                print(f"[API] Page {page_num} never arrived, delta scan stopped early")
+                break
+            page = pages[0]
+        if not any(uuid not in market.seen for uuid in page.uuids):
+            break
+        changed |= await _ingest_page(page)
+
+    return changed
+
+async def refresh_market() -> Optional[Set[str]]:
+    """
+    Brings the market up to date with the API and returns the item ids whose listings
+    changed, or None when the API hasn't refreshed since the last scan.
+    market.completeness says how much of the auction house the result reflects.
+    """
+    session = await http.start()
+    deadline = time.monotonic() + SCAN_DEADLINE
+
+    first = await fetch_page(session, 0, asyncio.Semaphore(1), stage="meta")
+    if first is None:
+        market.completeness = 0.0
+        return set()
+
+    last_updated = first.meta.get("lastUpdated")
+    # An incomplete market is fetched again even if the API hasn't moved on, so the
+    # pages it lost are retried on the next tick instead of whenever Hypixel refreshes
+    if last_updated is not None and last_updated == market.last_updated and market.completeness >= 1:
+        return None
+
+    # Auctions that sold in the last minute, recorded before they leave the market
+    with metrics.stage("ended_fetch"):
+        ended = await fetch_json(session, AUCTIONS_ENDED_URL)
+    sold = [auc.get("auction_id") for auc in (ended or {}).get("auctions", []) if auc.get("bin")]
+    await caches_ready("history")
+    if history is None:
+        # Only when the warmup never ran (the benchmark): an empty history that isn't saved
+        _adopt_history(_load_history())
+    for uuid in sold:
+        item_id = market.item_of(uuid)
+        if item_id is not None:
+            history.note_sold(item_id)
+
+    full_sync = (
+        not INCREMENTAL_SCANS
+        or market.last_updated is None
+        or time.time() - market.last_full_sync >= FULL_RESYNC_INTERVAL
+    )
+    if full_sync:
+        changed = await fetch_bins_async(session, first, set(sold), deadline)
+    else:
+        changed = await update_bins_async(session, first, sold, deadline)
+
+    market.last_updated = last_updated
+    await caches_ready("recorder")
+    if recorder is not None:
+        with metrics.stage("record"):
+            await asyncio.to_thread(write_checkpoints, [recorder.checkpoint(market, sold, last_updated, market.completeness)])
+    if market.completeness < 1:
+        # Pages we missed can't be caught up by a delta walk, so rebuild next scan
+        market.last_full_sync = 0.0
+    else:
+        # Gaps would skew the lowest-BIN and listing samples
+        history.record(market.groups)
+    return changed
 
 # -----------------------------
 # VOLUME FETCHING
 # -----------------------------
 
-_volume_cache: Dict[str, tuple[float, float]] = {}
 VOLUME_CACHE_TTL = 300  # seconds
 
-async def get_avg_daily_volume(session: ClientSession, item_id: str) -> Optional[float]:
-    now = time.time()
-    if item_id in _volume_cache:
-        volume, ts = _volume_cache[item_id]
-        if now - ts < VOLUME_CACHE_TTL:
-            return volume
-    try:
-        url = f"https://sky.coflnet.com/api/item/price/{item_id}/history/day"
-        async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                if isinstance(data, list) and len(data) > 0:
-                    volume = sum(x.get("volume", 0) for x in data) / len(data)
-                    _volume_cache[item_id] = (volume, now)
-                    return volume
-            return 0.0
-    except:
-        return None
+MIN_HISTORY_COVERAGE = 3600  # seconds of local history before VOLUME_SOURCE "local" is trusted
+
+volumes: Optional[VolumeService] = None
+# Built and loaded by the cache warmup; the scan waits on caches_ready("history") before using it
+history: Optional["PriceHistory"] = None
+
+async def lookup_volumes(item_ids: List[str]) -> List[Optional[float]]:
+    """Daily volume per id: from local history when configured and covered, coflnet otherwise."""
+    result: List[Optional[float]] = [None] * len(item_ids)
+    remote = range(len(item_ids))
+
+    if VOLUME_SOURCE == "local" and history.coverage() >= MIN_HISTORY_COVERAGE:
+        local = history.daily_volumes(item_ids)
+        remote = [i for i, volume in enumerate(local) if math.isnan(volume)]
+        for i, volume in enumerate(local):
+            if not math.isnan(volume):
+                result[i] = float(volume)
+
+    await caches_ready("volumes")
+    fetched = await asyncio.gather(*(volumes.get(item_ids[i]) for i in remote))
+    for i, volume in zip(remote, fetched):
+        result[i] = volume
+    return result
 
 # -----------------------------
 # FLIP FINDER
 # -----------------------------
 
-sent_uuids = deque(maxlen=10000)
-
 async def find_flips():
     print("\n[Flip Finder] Running scan…")
     start_time = time.time()
 
-    groups = await fetch_bins_async()
+    changed = await refresh_market()
     fetch_time = time.time() - start_time
-    print(f"[API] Fetched {sum(len(v) for v in groups.values()):,} bins in {fetch_time:.2f}s")
-
-    if not groups:
+    if changed is None:
+        print(f"[API] Auctions unchanged since last scan (lastUpdated={market.last_updated})")
+        return
+    print(
+        f"[API] Tracking {len(market):,} bins, {len(changed):,} items changed, in {fetch_time:.2f}s "
+        f"({market.completeness:.1%} complete)"
+    )
+    for host, stats in limiter_stats().items():
+        if stats["throttled"]:
+            print(f"[API] {host}: {stats['rate']} req/s, {stats['throttled']} throttled so far")
+    for host, stats in http.stats().items():
+        print(
+            f"[HTTP] {host}: {stats['requests']:,} requests, {stats['new_connections']} opened / "
+            f"{stats['reused_connections']:,} reused connections, {stats['avg_latency_ms']}ms avg"
+        )
+
+    tag_stats = _tag_cache.stats()
+    print(
+        f"[Cache] Tags: {tag_stats['entries']:,} entries, {tag_stats['hit_rate']:.1%} hit rate, "
+        f"{tag_stats['evictions']:,} evicted"
+    )
+
+    if not market.groups:
         print("No auction data found")
         return
 
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
-        tasks = []
-        valid_items = []
-
-        for item_id, auctions in groups.items():
-            if len(auctions) < MIN_LISTINGS:
-                continue
-
-            auctions.sort(key=lambda x: x["price"])
-            a1 = auctions[0]
-            a2 = auctions[1]
-
-            lowest = a1["price"]
-            second = a2["price"]
-            profit = second - lowest
-
-            required_profit = max(MIN_PROFIT, lowest * (MinProfitPercentage / 100))
-
-            if profit >= required_profit and lowest <= MAX_COST:
-
-                # REQUIRE: both lowest and second-lowest BIN to be single items (count == 1)
-                if get_item_count(a1["item_bytes"]) != 1:
-                    continue
-                if get_item_count(a2["item_bytes"]) != 1:
-                    continue
-
-                uid = a1["uuid"]
-                if uid not in sent_uuids:
-                    tasks.append(get_avg_daily_volume(session, item_id))
-                    valid_items.append((item_id, a1, a2, lowest, second, profit, uid))
+    with metrics.stage("evaluate"):
+        medians = {}
+        if RESALE_ESTIMATE == "median":
+            changed_ids = list(changed)
+            medians = dict(zip(changed_ids, history.price_percentiles(changed_ids, 50)))
+
+        candidates = select_candidates(market.groups, changed, medians, LIMITS)
+        matches = match_profiles(market.groups, candidates, PROFILES)
+    metrics.count("matches", len(matches))
+    if not matches:
+        print("No potential flips found")
+        return
 
-        if not valid_items:
-            print("No potential flips found")
+    # A missing page may hold a cheaper listing, so the "lowest" BIN isn't certain
+    warning = None
+    if market.completeness < 1:
+        if INCOMPLETE_SCANS == "suppress":
+            print(f"[Flip Finder] Scan only {market.completeness:.1%} complete, holding back {len(matches)} alert(s)")
             return
-
-        volumes = await asyncio.gather(*tasks)
-
-        found_flips = 0
-        for (item_id, a1, a2, lowest, second, profit, uid), avg_vol in zip(valid_items, volumes):
-            if avg_vol is not None and avg_vol >= MIN_DAILY_VOLUME and item_id not in BLACKLISTED_TAGS:
-                sent_uuids.append(uid)
+        warning = f"Scan {market.completeness:.1%} complete, a cheaper BIN may have been missed"
+
+    # One volume lookup per item, shared by every profile interested in it
+    item_ids = list({item[0] for _, item in matches})
+    with metrics.stage("volumes"):
+        avg_volumes = dict(zip(item_ids, await lookup_volumes(item_ids)))
+
+    session = await http.start()
+    await caches_ready("icons")
+    found_flips = 0
+    with metrics.stage("notify"):
+        for profile, (item_id, a1, a2, lowest, second, profit, uid) in matches:
+            avg_vol = avg_volumes[item_id]
+            if avg_vol is not None and avg_vol >= profile.min_daily_volume:
+                profile.sent_uuids.append(uid)
                 found_flips += 1
 
                 print(
-                    f"{a1['full_name']} | ID={item_id} | Profit: {profit:,} | "
+                    f"[{profile.name}] {a1.full_name} | ID={item_id} | Profit: {profit:,} | "
                     f"Lowest: {lowest:,} | Volume: {avg_vol:.2f} | UUID: {uid}"
                 )
 
-                itemURL = _icons_cache.get(item_id)
-                if not itemURL:
-                    async with session.get(f"https://sky.coflnet.com/api/item/{item_id}/details") as resp:
-                        if resp.status == 200:
-                            itemURL = (await resp.json()).get("iconUrl")
-                            if itemURL:
-                                _icons_cache[item_id] = itemURL
+                itemURL = await icon_indexer.icon_for(session, item_id)
 
-                notifier.send_flip(
-                    name=a1["full_name"],
+                profile.notifier.send_flip(
+                    name=a1.full_name,
                     profit=profit,
                     lowest=lowest,
                     volume=avg_vol,
                     uuid=uid,
-                    itemURL=itemURL
+                    itemURL=itemURL,
+                    warning=warning
                 )
 
-        print(f"Found {found_flips} flips")
+    metrics.count("alerts", found_flips)
+    print(f"Found {found_flips} flips across {len(PROFILES)} profile(s)")
+
+# -----------------------------
+# METRICS
+# -----------------------------
+
+def register_gauges():
+    """Figures the caches and queues already keep, read whenever metrics are reported."""
+    metrics.gauge("bins", lambda: len(market))
+    metrics.gauge("tag_cache_hit_rate", lambda: _tag_cache.stats()["hit_rate"])
+    metrics.gauge("name_cache_hit_rate", lambda: name_normaliser.stats()["hit_rate"])
+    metrics.gauge("volume_cache_hit_rate", volumes.hit_rate)
+    metrics.gauge("icon_cache_hit_rate", icon_indexer.hit_rate)
+    metrics.gauge("volume_requests_in_flight", lambda: volumes.stats()["in_flight"])
+    metrics.gauge("alert_queue", lambda: sum(profile.notifier.pending for profile in PROFILES))
+    metrics.gauge("throttled_total", lambda: sum(stats["throttled"] for stats in limiter_stats().values()))
+
+# -----------------------------
+# STARTUP
+# -----------------------------
+
+# Seconds per startup step, in the order they finished
+startup: Dict[str, float] = {"imports": _IMPORTED - _PROCESS_START}
+
+def configure(settings: Optional[Dict[str, Any]] = None):
+    """
+    Reads the settings (the settings file unless given) and profiles, and builds
+    everything that depends on them. Must run once before the first scan.
+    """
+    global data, PROFILES_DIR, PROFILES, LIMITS, ALLOWED_CATEGORIES, PAGE_CATEGORIES
+    global HYPIXEL_API, COFLNET_API, AUCTIONS_URL, AUCTIONS_ENDED_URL
+    global VOLUME_SOURCE, RESALE_ESTIMATE, INCREMENTAL_SCANS, INCOMPLETE_SCANS
+    global PREWARM_THUMBNAILS, RECORD_SCANS, INDEX_ICONS, METRICS_PORT
+    global thumbnails, name_normaliser, volumes, icon_indexer, recorder
+    start = time.perf_counter()
+
+    if settings is None:
+        settings = load_settings()
+        print("Loaded PRIVATE_SETTINGS..." if os.path.exists("PRIVATE_SETTINGS.json") else "Loaded Settings...")
+    data = settings
+
+    PROFILES_DIR = data.get("PROFILES_DIR", PROFILES_DIR)
+    PROFILES = load_profiles(PROFILES_DIR, data)
+    print(f"Loaded {len(PROFILES)} profile(s): {', '.join(p.name for p in PROFILES)}")
+    LIMITS = Thresholds(PROFILES)
+    ALLOWED_CATEGORIES = LIMITS.allowed_categories
+    PAGE_CATEGORIES = frozenset(ALLOWED_CATEGORIES)
+
+    HYPIXEL_API = data.get("HYPIXEL_API", HYPIXEL_API).rstrip("/")
+    COFLNET_API = data.get("COFLNET_API", COFLNET_API).rstrip("/")
+    AUCTIONS_URL = f"{HYPIXEL_API}/v2/skyblock/auctions"
+    AUCTIONS_ENDED_URL = f"{HYPIXEL_API}/v2/skyblock/auctions_ended"
+
+    VOLUME_SOURCE = data.get("VOLUME_SOURCE", VOLUME_SOURCE)
+    RESALE_ESTIMATE = data.get("RESALE_ESTIMATE", RESALE_ESTIMATE)
+    INCREMENTAL_SCANS = data.get("INCREMENTAL_SCANS", INCREMENTAL_SCANS)
+    INCOMPLETE_SCANS = data.get("INCOMPLETE_SCANS", INCOMPLETE_SCANS)
+    PREWARM_THUMBNAILS = data.get("PREWARM_THUMBNAILS", PREWARM_THUMBNAILS)
+    RECORD_SCANS = data.get("RECORD_SCANS", RECORD_SCANS)
+    INDEX_ICONS = data.get("INDEX_ICONS", INDEX_ICONS)
+    METRICS_PORT = data.get("METRICS_PORT", METRICS_PORT)
+    metrics.enabled = METRICS_PORT is not None
+
+    thumbnails = ThumbnailCache("Cache\\thumbnails")
+    for profile in PROFILES:
+        profile.notifier = DiscordNotifier(profile.webhook_url, thumbnails=thumbnails)
+
+    name_normaliser = NameNormaliser.from_file("Reforges.json", max_entries=200_000)
+    volumes = VolumeService(volume_cache_path, api=COFLNET_API, ttl=VOLUME_CACHE_TTL)
+    icon_indexer = IconIndexer(_icons_cache, api=COFLNET_API, max_rate=ICON_INDEX_MAX_RATE, reserve=ICON_INDEX_RESERVE)
+    recorder = None
+    if RECORD_SCANS:
+        from scan_log import ScanRecorder
+        recorder = ScanRecorder(RECORD_SCANS)
+
+    startup["settings and profiles"] = time.perf_counter() - start
+
+def report_startup(first_scan: float):
+    startup["first scan"] = first_scan
+    steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in startup.items())
+    loading = [name for name in _warmups if name not in _warmed]
+    print(
+        f"[Startup] First scan done {time.perf_counter() - _PROCESS_START:.2f}s after start: {steps}"
+        + (f" (still loading: {', '.join(loading)})" if loading else "")
+    )
 
 # -----------------------------
 # MAIN LOOP
@@ -380,15 +812,72 @@ cooldown = 7
 min_sleep = 2
 
 async def main_loop():
+    start_cache_warmup()
+    # Workers spawn while page 0 downloads; its parse just waits for the first one
+    asyncio.create_task(start_decode_pool())
+    session = await http.start()
+    volumes.start(session)
+    for profile in PROFILES:
+        await profile.notifier.start(session)
     asyncio.create_task(auto_save_cache_task())
+    asyncio.create_task(after_warmup(("volumes",), volumes.prefetch_loop))
+    if INDEX_ICONS:
+        asyncio.create_task(after_warmup(
+            ("icons",), lambda: icon_indexer.run_forever(session, lambda: list(market.groups), ICON_INDEX_INTERVAL)
+        ))
+    if PREWARM_THUMBNAILS:
+        # Profiles share one thumbnail cache, so warming it through any notifier serves all
+        asyncio.create_task(after_warmup(
+            ("icons",), lambda: PROFILES[0].notifier.prewarm_thumbnails(list(_icons_cache.values()))
+        ))
+
+    metrics_server = None
+    if metrics.enabled:
+        register_gauges()
+        asyncio.create_task(metrics.watch_loop())
+        try:
+            metrics_server = await metrics.serve(METRICS_PORT)
+            print(f"[Metrics] Serving on http://127.0.0.1:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"[Metrics] Could not serve on port {METRICS_PORT}, logging only: {e}")
 
-    while True:
-        loop_start = time.time()
-        await find_flips()
-        elapsed = time.time() - loop_start
-        sleep_time = max(min_sleep, cooldown - elapsed)
-        print(f"Waiting {sleep_time:.1f} seconds before searching again")
-        await asyncio.sleep(sleep_time)
+    first_scan = True
+    try:
+        while True:
+            loop_start = time.time()
+            metrics.begin_scan()
+            per_scan_peak = reset_peak_rss()
+            await find_flips()
+            elapsed = time.time() - loop_start
+            if first_scan:
+                report_startup(elapsed)
+                first_scan = False
+
+            rss, peak = memory_mb()
+            if rss is not None or peak is not None:
+                print(
+                    f"[Memory] {rss} MB resident, {peak} MB peak {'this scan' if per_scan_peak else 'so far'}, "
+                    f"{len(market):,} listings"
+                )
+            metrics.log_scan(metrics.end_scan(
+                completeness=round(market.completeness, 4), rss_mb=rss, peak_rss_mb=peak,
+            ))
+            slowest = metrics.slowest_stage()
+            if elapsed > cooldown and slowest is not None:
+                print(f"[Metrics] Scan took {elapsed:.1f}s, over the {cooldown}s budget; slowest stage: {slowest[0]} ({slowest[1]:.2f}s)")
+            sleep_time = max(min_sleep, cooldown - elapsed)
+            print(f"Waiting {sleep_time:.1f} seconds before searching again")
+            await asyncio.sleep(sleep_time)
+    finally:
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        for profile in PROFILES:
+            await profile.notifier.close()
+        await volumes.close()
+        await http.close()
 
 if __name__ == "__main__":
+    # Kept out of module scope: decode workers re-import this file when they spawn
+    configure()
+    atexit.register(save_caches)
     asyncio.run(main_loop())
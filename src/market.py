@@ -0,0 +1,183 @@
+import sys
+import heapq
+import itertools
+
+from typing import Dict, KeysView, List, Optional, Set
+
+
+class Listing:
+    """
+    One live BIN, holding only what evaluation and alerts read. The raw item_bytes are
+    dropped once decoded, and the strings many listings repeat (names, ids, categories)
+    are interned, so the market costs a small fixed amount per listing.
+    """
+
+    __slots__ = ("price", "uuid", "full_name", "id", "count", "category")
+
+    def __init__(self, price: int, uuid: str, full_name: str, item_id: str,
+                 count: Optional[int] = None, category: Optional[str] = None):
+        self.price = price
+        self.uuid = uuid
+        self.full_name = sys.intern(full_name)
+        self.id = sys.intern(item_id)
+        self.count = count
+        self.category = None if category is None else sys.intern(category)
+
+    def __repr__(self) -> str:
+        return f"Listing({self.price}, {self.uuid!r}, {self.full_name!r}, {self.id!r}, {self.count}, {self.category!r})"
+
+
+class OrderBook:
+    """
+    One item's BIN listings: a price heap with lazy deletion plus a uuid index.
+    Insert and remove are O(log n) / O(1), and the two cheapest listings are cached
+    until a change could affect them.
+    """
+
+    __slots__ = ("_heap", "_entries", "_top")
+
+    _tokens = itertools.count()
+
+    def __init__(self):
+        # Heap items are (price, token, uuid); an item is live only while _entries still
+        # maps its uuid to the same token, so re-listing a uuid orphans the old item
+        self._heap: List[tuple] = []
+        self._entries: Dict[str, tuple] = {}
+        self._top: Optional[List[Listing]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, uuid: str) -> bool:
+        return uuid in self._entries
+
+    def __iter__(self):
+        return (entry for entry, _ in self._entries.values())
+
+    def get(self, uuid: str) -> Optional[Listing]:
+        item = self._entries.get(uuid)
+        return item[0] if item is not None else None
+
+    def add(self, entry: Listing):
+        token = next(self._tokens)
+        price = entry.price
+        uuid = entry.uuid
+        self._entries[uuid] = (entry, token)
+        heapq.heappush(self._heap, (price, token, uuid))
+
+        top = self._top
+        if top is not None:
+            if len(top) < 2 or price <= top[-1].price or any(e.uuid == uuid for e in top):
+                self._top = None
+
+    def remove(self, uuid: str) -> Optional[Listing]:
+        item = self._entries.pop(uuid, None)
+        if item is None:
+            return None
+
+        if self._top is not None and any(e.uuid == uuid for e in self._top):
+            self._top = None
+
+        # Rebuild once orphaned heap items outnumber live ones
+        if len(self._heap) > 2 * len(self._entries) + 16:
+            self._heap = [(e.price, token, u) for u, (e, token) in self._entries.items()]
+            heapq.heapify(self._heap)
+        return item[0]
+
+    def _prune(self):
+        heap = self._heap
+        entries = self._entries
+        while heap:
+            _, token, uuid = heap[0]
+            item = entries.get(uuid)
+            if item is not None and item[1] == token:
+                return
+            heapq.heappop(heap)
+
+    def top_two(self) -> List[Listing]:
+        """The cheapest and second-cheapest listings (fewer if the book is that small)."""
+        if self._top is not None:
+            return self._top
+
+        heap = self._heap
+        self._prune()
+        if not heap:
+            self._top = []
+            return self._top
+
+        first = heapq.heappop(heap)
+        self._prune()
+        second = heap[0] if heap else None
+        heapq.heappush(heap, first)
+
+        top = [self._entries[first[2]][0]]
+        if second is not None:
+            top.append(self._entries[second[2]][0])
+        self._top = top
+        return top
+
+
+class MarketState:
+    """
+    The BIN listings we currently believe are live, carried between scans.
+    Listings are grouped per item id and indexed by auction uuid so single listings can
+    be added or removed as the API reports them, instead of rebuilding every group.
+    """
+
+    def __init__(self):
+        self.groups: Dict[str, OrderBook] = {}
+        self._item_of: Dict[str, str] = {}
+
+        # Every uuid the API has shown us since the last full sync, BIN or not, so the
+        # incremental walk knows when it has reached listings it already processed
+        self.seen: Set[str] = set()
+
+        self.last_updated: Optional[int] = None
+        self.last_full_sync = 0.0
+
+        # Share of the pages the last sync needed that actually arrived
+        self.completeness = 1.0
+
+    def __contains__(self, uuid: str) -> bool:
+        return uuid in self._item_of
+
+    def __len__(self) -> int:
+        return len(self._item_of)
+
+    def reset(self) -> Dict[str, str]:
+        """Empties the market and returns the uuid -> item id map it held."""
+        previous = self._item_of
+        self.groups = {}
+        self._item_of = {}
+        self.seen = set()
+        return previous
+
+    def uuids(self) -> KeysView[str]:
+        return self._item_of.keys()
+
+    def item_of(self, uuid: str) -> Optional[str]:
+        return self._item_of.get(uuid)
+
+    def add(self, entry: Listing) -> str:
+        item_id = entry.id
+        uuid = entry.uuid
+        book = self.groups.get(item_id)
+        if book is None:
+            book = self.groups[item_id] = OrderBook()
+        book.add(entry)
+        self._item_of[uuid] = item_id
+        self.seen.add(uuid)
+        return item_id
+
+    def remove(self, uuid: str) -> Optional[str]:
+        """Drops a listing and returns the item id it belonged to, if we had it."""
+        self.seen.add(uuid)
+        item_id = self._item_of.pop(uuid, None)
+        if item_id is None:
+            return None
+
+        book = self.groups[item_id]
+        book.remove(uuid)
+        if not book:
+            del self.groups[item_id]
+        return item_id
@@ -0,0 +1,293 @@
+import sys
+import json
+import time
+import asyncio
+
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+# -----------------------------
+# MEMORY
+# -----------------------------
+
+def memory_mb() -> Tuple[Optional[float], Optional[float]]:
+    """
+    The process's current and peak resident set size in MB, where the platform says.
+    On Linux the peak is since the last reset_peak_rss(), so it can be read per scan.
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if line.startswith(("VmRSS", "VmHWM")))
+        return (
+            round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+            round(int(fields["VmHWM"].split()[0]) / 1024, 1),
+        )
+    except (OSError, KeyError, ValueError):
+        pass
+
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        peak = getattr(info, "peak_wset", None)
+        return round(info.rss / 2**20, 1), round(peak / 2**20, 1) if peak is not None else None
+    except ImportError:
+        pass
+
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return None, round(peak / (2**20 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        return None, None
+
+def reset_peak_rss() -> bool:
+    """Restarts the peak RSS high-water mark (Linux only). Returns whether it could."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+# -----------------------------
+# HISTOGRAMS AND SCAN METRICS
+# -----------------------------
+
+class Histogram:
+    """The last `size` observations of one value, summarised on demand."""
+
+    __slots__ = ("samples", "count", "total")
+
+    def __init__(self, size: int = 512):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": self.count}
+
+        def pct(p: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 4)
+
+        return {
+            "count": self.count,
+            "window": len(ordered),
+            "mean": round(sum(ordered) / len(ordered), 4),
+            "p50": pct(50),
+            "p90": pct(90),
+            "p99": pct(99),
+            "max": round(ordered[-1], 4),
+        }
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = self.metrics._enter(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._exit(self.name, self.start)
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+class Metrics:
+    """
+    Per-scan instrumentation for the flip loop.
+
+    - `stage(name)` times a block. A scan's figure for a stage is the wall time during
+      which at least one such block was running, so concurrent page fetches count once
+      and the stages of a scan can be compared against its duration; each block's own
+      duration also goes into a `call.<name>` histogram
+    - `count(name)` and `peak(name, value)` track events and high-water marks per scan
+    - `gauge(name, fn)` registers a value read only when metrics are reported, for
+      things the code already tracks (cache hit rates, queue depths)
+    - `end_scan()` closes the scan: every stage total, counter and peak goes into a
+      rolling histogram and the scan is returned as one flat record
+
+    Disabled, every call returns straight away and `stage` hands back a shared no-op
+    context manager, so instrumented code costs a method call per stage.
+    """
+
+    def __init__(self, enabled: bool = False, window: int = 512):
+        self.enabled = enabled
+        self.window = window
+        self.started = time.time()
+
+        self.histograms: Dict[str, Histogram] = {}
+        self.totals: Dict[str, float] = {}
+        self.gauges: Dict[str, Callable[[], Any]] = {}
+        self.scans = 0
+        self.last_scan: Optional[Dict[str, Any]] = None
+
+        self._scan_start = time.perf_counter()
+        self._times: Dict[str, float] = {}
+        self._active: Dict[str, int] = {}
+        self._since: Dict[str, float] = {}
+        self._counts: Dict[str, float] = {}
+        self._peaks: Dict[str, float] = {}
+
+    # -----------------------------
+    # RECORDING
+    # -----------------------------
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def _enter(self, name: str) -> float:
+        now = time.perf_counter()
+        active = self._active.get(name, 0)
+        if not active:
+            self._since[name] = now
+        self._active[name] = active + 1
+        return now
+
+    def _exit(self, name: str, start: float):
+        now = time.perf_counter()
+        self._histogram(f"call.{name}").add(now - start)
+        active = self._active[name] - 1
+        self._active[name] = active
+        if not active:
+            self._times[name] = self._times.get(name, 0.0) + now - self._since[name]
+
+    def count(self, name: str, n: float = 1):
+        if self.enabled:
+            self._counts[name] = self._counts.get(name, 0) + n
+
+    def peak(self, name: str, value: float):
+        if self.enabled and value > self._peaks.get(name, float("-inf")):
+            self._peaks[name] = value
+
+    def observe(self, name: str, value: float):
+        """Adds one sample straight to a histogram, outside the per-scan totals."""
+        if self.enabled:
+            self._histogram(name).add(value)
+
+    def gauge(self, name: str, fn: Callable[[], Any]):
+        self.gauges[name] = fn
+
+    def _histogram(self, name: str) -> Histogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(self.window)
+        return histogram
+
+    # -----------------------------
+    # SCANS
+    # -----------------------------
+
+    def begin_scan(self):
+        self._scan_start = time.perf_counter()
+        self._times.clear()
+        self._since = {name: self._scan_start for name in self._since}
+        self._counts.clear()
+        self._peaks.clear()
+
+    def end_scan(self, **fields) -> Optional[Dict[str, Any]]:
+        """Closes the running scan and returns its record, or None when disabled."""
+        if not self.enabled:
+            return None
+
+        elapsed = time.perf_counter() - self._scan_start
+        self.scans += 1
+        self._histogram("scan.seconds").add(elapsed)
+        for name, seconds in self._times.items():
+            self._histogram(f"stage.{name}").add(seconds)
+        for name, n in self._counts.items():
+            self._histogram(f"count.{name}").add(n)
+            self.totals[name] = self.totals.get(name, 0) + n
+        for name, value in self._peaks.items():
+            self._histogram(f"peak.{name}").add(value)
+
+        self.last_scan = {
+            "scan": self.scans,
+            "time": round(time.time(), 3),
+            "seconds": round(elapsed, 4),
+            **fields,
+            "stages": {name: round(seconds, 4) for name, seconds in self._times.items()},
+            "counts": dict(self._counts),
+            "peaks": {name: round(value, 4) for name, value in self._peaks.items()},
+            "gauges": self.read_gauges(),
+        }
+        return self.last_scan
+
+    def slowest_stage(self) -> Optional[tuple]:
+        if not self._times:
+            return None
+        return max(self._times.items(), key=lambda item: item[1])
+
+    def log_scan(self, record: Optional[Dict[str, Any]]):
+        """The scan as a single JSON log line."""
+        if record is not None:
+            print("[Metrics]", json.dumps(record, separators=(",", ":")))
+
+    # -----------------------------
+    # REPORTING
+    # -----------------------------
+
+    def read_gauges(self) -> Dict[str, Any]:
+        values = {}
+        for name, fn in self.gauges.items():
+            try:
+                value = fn()
+            except Exception:
+                value = None
+            values[name] = round(value, 4) if isinstance(value, float) else value
+        return values
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "uptime": round(time.time() - self.started, 1),
+            "scans": self.scans,
+            "last_scan": self.last_scan,
+            "totals": dict(self.totals),
+            "gauges": self.read_gauges(),
+            "histograms": {name: h.summary() for name, h in sorted(self.histograms.items())},
+        }
+
+    async def watch_loop(self, interval: float = 0.25):
+        """Samples event-loop lag: how late a sleep of `interval` wakes up. Meant as a background task."""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            lag = loop.time() - start - interval
+            self.observe("loop_lag", lag)
+            self.peak("loop_lag", lag)
+
+    async def serve(self, port: int, host: str = "127.0.0.1"):
+        """Serves snapshot() as JSON on GET /metrics. Returns the runner to clean up."""
+        from aiohttp import web
+
+        async def handler(request: web.Request) -> web.Response:
+            return web.json_response(self.snapshot())
+
+        app = web.Application()
+        app.router.add_get("/metrics", handler)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
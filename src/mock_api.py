@@ -0,0 +1,222 @@
+"""
+Local stand-in for the Hypixel auction endpoints that replays recorded snapshots,
+plus the coflnet price-history and item-details endpoints.
+
+    python mock_api.py record Snapshots --count 5     records 5 consecutive live snapshots
+    python mock_api.py serve Snapshots --port 8080    replays them
+
+Then set "HYPIXEL_API" and "COFLNET_API" to "http://127.0.0.1:8080" in PRIVATE_SETTINGS.json,
+and optionally "WEBHOOK_URL" to "http://127.0.0.1:8080/webhook" to swallow alerts.
+
+Each snapshot is a directory holding page_<n>.json for every auctions page plus
+ended.json for the auctions_ended feed at the same moment. Price history comes from
+history.json (item id -> list of days) next to the snapshots when present, and is
+otherwise made up deterministically per item id.
+"""
+
+import os
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+import aiohttp
+
+from aiohttp import web
+
+LIVE_API = "https://api.hypixel.net"
+
+# -----------------------------
+# RECORDING
+# -----------------------------
+
+async def _get_bytes(session: aiohttp.ClientSession, url: str) -> bytes:
+    for attempt in range(5):
+        async with session.get(url) as resp:
+            if resp.status == 200:
+                return await resp.read()
+            await asyncio.sleep(attempt + 1)
+    raise RuntimeError(f"Failed to fetch {url}")
+
+async def record(out_dir: str, count: int, api: str = LIVE_API):
+    os.makedirs(out_dir, exist_ok=True)
+    last_updated = None
+
+    async with aiohttp.ClientSession() as session:
+        for n in range(count):
+            # Wait for the API to publish a new snapshot before recording the next one
+            while True:
+                raw = await _get_bytes(session, f"{api}/v2/skyblock/auctions")
+                meta = json.loads(raw)
+                if meta.get("lastUpdated") != last_updated:
+                    break
+                await asyncio.sleep(5)
+            last_updated = meta.get("lastUpdated")
+
+            snapshot_dir = os.path.join(out_dir, f"{n:04d}")
+            os.makedirs(snapshot_dir, exist_ok=True)
+
+            pages = [raw] + await asyncio.gather(*(
+                _get_bytes(session, f"{api}/v2/skyblock/auctions?page={page}")
+                for page in range(1, meta.get("totalPages", 0))
+            ))
+            for page, page_raw in enumerate(pages):
+                with open(os.path.join(snapshot_dir, f"page_{page}.json"), "wb") as f:
+                    f.write(page_raw)
+
+            ended = await _get_bytes(session, f"{api}/v2/skyblock/auctions_ended")
+            with open(os.path.join(snapshot_dir, "ended.json"), "wb") as f:
+                f.write(ended)
+
+            print(f"[Record] Snapshot {n} ({len(pages)} pages, lastUpdated={last_updated})")
+
+# -----------------------------
+# REPLAY SERVER
+# -----------------------------
+
+class SnapshotReplay:
+    def __init__(self, snapshots_dir: str, history_fail_rate: float = 0.0, page_fail_rate: float = 0.0):
+        self.history_fail_rate = history_fail_rate
+        self.page_fail_rate = page_fail_rate
+        self.history_requests = 0
+        self.throttled_pages = 0
+        self.webhook_posts = 0
+        self.history = {}
+        history_path = os.path.join(snapshots_dir, "history.json")
+        if os.path.exists(history_path):
+            with open(history_path, "r") as f:
+                self.history = json.load(f)
+
+        self.snapshots = sorted(
+            os.path.join(snapshots_dir, name) for name in os.listdir(snapshots_dir)
+            if os.path.isdir(os.path.join(snapshots_dir, name))
+        )
+        if not self.snapshots:
+            raise ValueError(f"No snapshots in {snapshots_dir}")
+        self.index = 0
+
+    @property
+    def current(self) -> str:
+        return self.snapshots[self.index]
+
+    def advance(self) -> bool:
+        if self.index + 1 >= len(self.snapshots):
+            return False
+        self.index += 1
+        return True
+
+    def _file_response(self, name: str) -> web.Response:
+        path = os.path.join(self.current, name)
+        if not os.path.exists(path):
+            return web.json_response({"success": False, "cause": "Page not found"}, status=404)
+        with open(path, "rb") as f:
+            return web.Response(body=f.read(), content_type="application/json")
+
+    async def auctions(self, request: web.Request) -> web.Response:
+        page = request.query.get("page", "0")
+        if not page.isdigit():
+            return web.json_response({"success": False, "cause": "Invalid page"}, status=422)
+        if page != "0" and random.random() < self.page_fail_rate:
+            self.throttled_pages += 1
+            return web.json_response({"success": False, "cause": "Simulated throttle"}, status=429, headers={"Retry-After": "1"})
+        return self._file_response(f"page_{int(page)}.json")
+
+    async def auctions_ended(self, request: web.Request) -> web.Response:
+        return self._file_response("ended.json")
+
+    async def price_history(self, request: web.Request) -> web.Response:
+        self.history_requests += 1
+        if random.random() < self.history_fail_rate:
+            return web.json_response({"message": "Simulated failure"}, status=503)
+
+        item_id = request.match_info["item_id"]
+        days = self.history.get(item_id)
+        if days is None:
+            seed = int(hashlib.md5(item_id.encode()).hexdigest()[:8], 16)
+            days = [{"volume": (seed >> shift) % 40, "min": 0, "max": 0, "avg": 0} for shift in range(7)]
+        return web.json_response(days)
+
+    async def item_details(self, request: web.Request) -> web.Response:
+        item_id = request.match_info["item_id"]
+        return web.json_response({"tag": item_id, "iconUrl": f"{request.url.origin()}/static/icon/{item_id}"})
+
+    async def icon(self, request: web.Request) -> web.Response:
+        from PIL import Image
+        from io import BytesIO
+
+        seed = hashlib.md5(request.match_info["item_id"].encode()).digest()
+        buf = BytesIO()
+        Image.new("RGBA", (64, 64), tuple(seed[:3]) + (255,)).save(buf, format="PNG")
+        return web.Response(body=buf.getvalue(), content_type="image/png")
+
+    async def webhook(self, request: web.Request) -> web.Response:
+        """Accepts alerts like a Discord webhook would, without delivering them anywhere."""
+        await request.read()
+        self.webhook_posts += 1
+        return web.Response(status=204, headers={"X-RateLimit-Remaining": "4", "X-RateLimit-Reset-After": "0.5"})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "snapshot": self.index,
+            "history_requests": self.history_requests,
+            "throttled_pages": self.throttled_pages,
+            "webhook_posts": self.webhook_posts,
+        })
+
+    async def advance_handler(self, request: web.Request) -> web.Response:
+        self.advance()
+        return web.json_response({"snapshot": self.index})
+
+def build_app(replay: SnapshotReplay) -> web.Application:
+    app = web.Application()
+    app.router.add_get("/v2/skyblock/auctions", replay.auctions)
+    app.router.add_get("/v2/skyblock/auctions_ended", replay.auctions_ended)
+    app.router.add_get("/api/item/price/{item_id}/history/day", replay.price_history)
+    app.router.add_get("/api/item/{item_id}/details", replay.item_details)
+    app.router.add_get("/static/icon/{item_id}", replay.icon)
+    app.router.add_post("/webhook", replay.webhook)
+    app.router.add_get("/stats", replay.stats)
+    app.router.add_post("/advance", replay.advance_handler)
+    return app
+
+async def serve(snapshots_dir: str, host: str, port: int, interval: float,
+                history_fail_rate: float = 0.0, page_fail_rate: float = 0.0):
+    replay = SnapshotReplay(snapshots_dir, history_fail_rate, page_fail_rate)
+    runner = web.AppRunner(build_app(replay))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"[Mock API] Serving {len(replay.snapshots)} snapshots on http://{host}:{port}")
+
+    try:
+        while True:
+            if interval > 0:
+                await asyncio.sleep(interval)
+                if replay.advance():
+                    print(f"[Mock API] Now serving snapshot {replay.index}")
+            else:
+                await asyncio.sleep(3600)  # advanced only through POST /advance
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record")
+    rec.add_argument("dir")
+    rec.add_argument("--count", type=int, default=3)
+
+    srv = sub.add_parser("serve")
+    srv.add_argument("dir")
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=8080)
+    srv.add_argument("--interval", type=float, default=60, help="seconds per snapshot, 0 to advance manually")
+    srv.add_argument("--history-fail-rate", type=float, default=0.0, help="fraction of history requests answered with 503")
+    srv.add_argument("--page-fail-rate", type=float, default=0.0, help="fraction of auction page requests answered with 429")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        asyncio.run(record(args.dir, args.count))
+    else:
+        asyncio.run(serve(args.dir, args.host, args.port, args.interval, args.history_fail_rate, args.page_fail_rate))
@@ -0,0 +1,62 @@
+import re
+import json
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List
+
+BANNED_CHARS = "✪✿⚚✦➊➋➌➍➎"
+
+# Perfect armour is itself a reforge word, so it is stripped and put back
+PERFECT_ARMOUR = ("Helmet", "Chestplate", "Leggings", "Boots")
+
+class NameNormaliser:
+    """
+    Turns a listing's item_name into the display name listings are compared by:
+    star characters removed, leading reforge words dropped, whitespace collapsed.
+
+    The reforges are compiled once into a single anchored pattern that consumes every
+    leading reforge word in one match, and results are memoised raw -> clean in an
+    LRU of `max_entries` names, so a name seen on an earlier scan is one lookup.
+    """
+
+    def __init__(self, reforges: Iterable[str], max_entries: int = 100_000):
+        self.reforges = frozenset(reforges)
+        self._banned = str.maketrans("", "", BANNED_CHARS)
+
+        # Longest first, so a reforge that prefixes another can't cut a word short
+        words = "|".join(re.escape(word) for word in sorted(self.reforges, key=len, reverse=True))
+        self._prefix = re.compile(rf"(?:(?:{words})(?:\s+|$))*") if words else None
+
+        self.clean = lru_cache(maxsize=max_entries)(self._clean)
+
+    @classmethod
+    def from_file(cls, path: str = "Reforges.json", **kwargs) -> "NameNormaliser":
+        with open(path, "r") as f:
+            return cls(json.load(f).get("Reforges", []), **kwargs)
+
+    def _clean(self, name: str) -> str:
+        name = name.translate(self._banned).strip()
+        if self._prefix is not None:
+            name = name[self._prefix.match(name).end():]
+        name = " ".join(name.split())
+
+        if name.startswith(PERFECT_ARMOUR) and name.find("-", 5) > 0:
+            name = "Perfect " + name
+        return name
+
+    def clean_many(self, names: Iterable[str]) -> List[str]:
+        """Normalises a whole page of names in one call."""
+        return list(map(self.clean, names))
+
+    def cache_clear(self):
+        self.clean.cache_clear()
+
+    def stats(self) -> Dict[str, Any]:
+        info = self.clean.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "entries": info.currsize,
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+        }
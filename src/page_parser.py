@@ -0,0 +1,47 @@
+import json
+
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional
+
+try:
+    import orjson
+    loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    loads = json.loads
+    JSON_BACKEND = "json"
+
+class Auction(NamedTuple):
+    """The only auction fields the flipper reads; everything else is dropped at parse time."""
+    uuid: str
+    bin: bool
+    category: Optional[str]
+    starting_bid: int
+    item_name: str
+    item_bytes: Optional[str]
+
+class Page(NamedTuple):
+    meta: Dict[str, Any]       # the response without its "auctions" list
+    uuids: List[str]           # every auction on the page, BIN or not
+    auctions: List[Auction]    # only the BINs in the wanted categories
+
+def parse_page(raw: bytes, categories: Optional[FrozenSet[str]] = None) -> Page:
+    """
+    Parses an auctions page from its raw bytes. Meant to run on a worker process:
+    the full document is parsed there and only the slim Page is sent back.
+    """
+    data = loads(raw)
+    auctions = data.pop("auctions", None) or []
+
+    uuids = []
+    wanted = []
+    for auc in auctions:
+        uuid = auc["uuid"]
+        uuids.append(uuid)
+        if not auc.get("bin"):
+            continue
+        category = auc.get("category")
+        if categories is not None and category not in categories:
+            continue
+        wanted.append(Auction(uuid, True, category, auc["starting_bid"], auc["item_name"], auc.get("item_bytes")))
+
+    return Page(data, uuids, wanted)
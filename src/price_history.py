@@ -0,0 +1,193 @@
+import os
+import time
+import numpy as np
+
+from collections import Counter
+from typing import Callable, Dict, Iterable, Mapping, Optional
+
+class PriceHistory:
+    """
+    Rolling per-item market history built from our own scans.
+
+    Every `sample_interval` seconds one column is written for every tracked item:
+    lowest BIN, number of listings, and how many listings sold (from the ended-auctions
+    feed) or disappeared otherwise since the previous column. Columns live in a ring
+    shared by all items, so each statistic is a single array operation over a
+    (items x samples) matrix instead of a Python loop.
+    """
+
+    def __init__(self, path: Optional[str] = None, sample_interval: float = 300, window: float = 86400):
+        self.path = path
+        self.sample_interval = sample_interval
+        self.window = window
+        self.capacity = int(window // sample_interval) + 1
+
+        self._rows: Dict[str, int] = {}
+        self._times = np.zeros(self.capacity, dtype=np.float64)  # 0 marks an unused column
+        self._lowest = np.full((0, self.capacity), np.nan, dtype=np.float64)
+        self._listings = np.zeros((0, self.capacity), dtype=np.int32)
+        self._sold = np.zeros((0, self.capacity), dtype=np.uint16)
+        self._removed = np.zeros((0, self.capacity), dtype=np.uint16)
+        self._head = 0
+
+        self._pending_sold: Counter = Counter()
+        self._pending_removed: Counter = Counter()
+
+    # -----------------------------
+    # RECORDING
+    # -----------------------------
+
+    def _row(self, item_id: str) -> int:
+        row = self._rows.get(item_id)
+        if row is not None:
+            return row
+
+        row = self._rows[item_id] = len(self._rows)
+        if row >= self._lowest.shape[0]:
+            grow = max(256, self._lowest.shape[0])
+            self._lowest = np.vstack([self._lowest, np.full((grow, self.capacity), np.nan)])
+            self._listings = np.vstack([self._listings, np.zeros((grow, self.capacity), np.int32)])
+            self._sold = np.vstack([self._sold, np.zeros((grow, self.capacity), np.uint16)])
+            self._removed = np.vstack([self._removed, np.zeros((grow, self.capacity), np.uint16)])
+        return row
+
+    def note_sold(self, item_id: str, count: int = 1):
+        self._pending_sold[item_id] += count
+
+    def note_removed(self, item_id: str, count: int = 1):
+        self._pending_removed[item_id] += count
+
+    def record(self, books: Mapping[str, "OrderBook"], now: Optional[float] = None) -> bool:
+        """Writes a sample column if one is due. Returns whether it did."""
+        now = time.time() if now is None else now
+        last = self._times[(self._head - 1) % self.capacity]
+        if now - last < self.sample_interval:
+            return False
+
+        col = self._head
+        rows = [self._row(item_id) for item_id in books]
+        self._lowest[:, col] = np.nan
+        self._listings[:, col] = 0
+        self._sold[:, col] = 0
+        self._removed[:, col] = 0
+
+        if rows:
+            lowest = [book.top_two()[0].price if book else np.nan for book in books.values()]
+            self._lowest[rows, col] = lowest
+            self._listings[rows, col] = [len(book) for book in books.values()]
+
+        for pending, matrix in ((self._pending_sold, self._sold), (self._pending_removed, self._removed)):
+            if pending:
+                matrix[[self._row(item_id) for item_id in pending], col] = np.minimum(list(pending.values()), 65535)
+                pending.clear()
+
+        self._times[col] = now
+        self._head = (col + 1) % self.capacity
+        return True
+
+    # -----------------------------
+    # QUERIES
+    # -----------------------------
+
+    def _columns(self, now: float, window: float) -> np.ndarray:
+        return (self._times > 0) & (self._times > now - window)
+
+    def coverage(self, now: Optional[float] = None) -> float:
+        """Seconds of history inside the window."""
+        now = time.time() if now is None else now
+        cols = self._columns(now, self.window)
+        if not cols.any():
+            return 0.0
+        return float(now - self._times[cols].min())
+
+    def _select(self, item_ids: Iterable[str]):
+        item_ids = list(item_ids)
+        rows = np.array([self._rows.get(item_id, -1) for item_id in item_ids], dtype=np.int64)
+        known = rows >= 0
+        return rows, known
+
+    def daily_volumes(self, item_ids: Iterable[str], now: Optional[float] = None) -> np.ndarray:
+        """Sales per day over the window, scaled to the history actually covered. NaN for unknown ids."""
+        now = time.time() if now is None else now
+        rows, known = self._select(item_ids)
+        out = np.full(len(rows), np.nan)
+        span = self.coverage(now)
+        if span <= 0 or not known.any():
+            return out
+
+        cols = self._columns(now, self.window)
+        sold = self._sold[rows[known]][:, cols].sum(axis=1, dtype=np.int64)
+        out[known] = sold * (86400 / max(span, self.sample_interval))
+        return out
+
+    def price_percentiles(self, item_ids: Iterable[str], q=50, now: Optional[float] = None) -> np.ndarray:
+        """Percentile(s) of the sampled lowest BIN over the window, one row per id. NaN where unknown."""
+        now = time.time() if now is None else now
+        rows, known = self._select(item_ids)
+        q = np.atleast_1d(q)
+        out = np.full((len(rows), len(q)), np.nan)
+        cols = self._columns(now, self.window)
+        if not cols.any() or not known.any():
+            return out if len(q) > 1 else out[:, 0]
+
+        lowest = self._lowest[rows[known]][:, cols]
+        has_data = ~np.isnan(lowest).all(axis=1)
+        values = np.full((lowest.shape[0], len(q)), np.nan)
+        if has_data.any():
+            values[has_data] = np.nanpercentile(lowest[has_data], q, axis=1).T
+        out[known] = values
+        return out if len(q) > 1 else out[:, 0]
+
+    def average_listings(self, item_ids: Iterable[str], now: Optional[float] = None) -> np.ndarray:
+        now = time.time() if now is None else now
+        rows, known = self._select(item_ids)
+        out = np.full(len(rows), np.nan)
+        cols = self._columns(now, self.window)
+        if cols.any() and known.any():
+            out[known] = self._listings[rows[known]][:, cols].mean(axis=1)
+        return out
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # -----------------------------
+    # PERSISTENCE
+    # -----------------------------
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with np.load(self.path, allow_pickle=False) as data:
+            if data["times"].shape[0] != self.capacity:
+                return  # sampling settings changed, start over
+            ids = [str(item_id) for item_id in data["ids"]]
+            self._rows = {item_id: i for i, item_id in enumerate(ids)}
+            self._times = data["times"].copy()
+            self._lowest = data["lowest"].copy()
+            self._listings = data["listings"].copy()
+            self._sold = data["sold"].copy()
+            self._removed = data["removed"].copy()
+            self._head = int(data["head"])
+
+    def checkpoint(self) -> Optional[Callable[[], None]]:
+        """Copies the arrays on the calling thread; the returned writer can run anywhere."""
+        if not self.path:
+            return None
+
+        n = len(self._rows)
+        arrays = {
+            "ids": np.array(list(self._rows), dtype=np.str_),
+            "times": self._times.copy(),
+            "lowest": self._lowest[:n].copy(),
+            "listings": self._listings[:n].copy(),
+            "sold": self._sold[:n].copy(),
+            "removed": self._removed[:n].copy(),
+            "head": np.array(self._head),
+        }
+
+        def write():
+            tmp_path = self.path + ".tmp.npz"
+            np.savez_compressed(tmp_path, **arrays)
+            os.replace(tmp_path, self.path)
+
+        return write
@@ -0,0 +1,104 @@
+import os
+import json
+
+from collections import deque
+from typing import Any, Dict, List, Optional, Union
+
+# -----------------------------
+# SETTINGS PARSING
+# -----------------------------
+
+def load_settings(path: Optional[str] = None) -> Dict[str, Any]:
+    """PRIVATE_SETTINGS.json when it exists, Settings.json otherwise, unless a file is given."""
+    if path is None:
+        path = "PRIVATE_SETTINGS.json" if os.path.exists("PRIVATE_SETTINGS.json") else "Settings.json"
+    with open(path, "r") as f:
+        return json.load(f)
+
+def parseSettingsValue(v: str) -> float:
+    if "." in v:
+        return float(v.replace(",", ""))
+    else:
+        return int(v.replace(",", ""))
+
+def parsePercent(v: str) -> Union[int, float]:
+    formatted = v
+
+    for char in formatted:
+        if char == "%":
+            formatted = formatted.replace("%", "")
+
+    if "." in formatted:
+        return float(formatted)
+
+    return int(formatted)
+
+# -----------------------------
+# PROFILES
+# -----------------------------
+
+class Profile:
+    """
+    One trader's thresholds, categories, blacklist and webhook, in the same shape as
+    Settings.json. Every profile is evaluated against the same shared scan.
+    """
+
+    def __init__(self, name: str, data: Dict[str, Any]):
+        self.name = name
+        self.allowed_categories = set(data["ALLOWED_CATEGORIES"])
+        self.blacklisted_tags = set(data["BLACKLISTED_TAGS"])
+        self.webhook_url = data["WEBHOOK_URL"]
+
+        self.min_profit = parseSettingsValue(data["Profit"]["MinProfit"])
+        self.min_profit_percentage = parsePercent(data["Profit"]["MinProfitPercentage"])  # The min profit in % of the item's cost
+
+        self.max_cost = parseSettingsValue(data["MAX_COST"])
+        self.min_listings = parseSettingsValue(data["MIN_LISTINGS"])
+        self.min_daily_volume = parseSettingsValue(data["MIN_DAILY_VOLUME"])
+
+        self.notifier = None
+        self.sent_uuids = deque(maxlen=10000)
+
+    @classmethod
+    def from_file(cls, path: str, defaults: Dict[str, Any]) -> "Profile":
+        """Loads a profile; keys it leaves out fall back to the main settings."""
+        with open(path, "r") as f:
+            data = json.load(f)
+
+        merged = {**defaults, **data}
+        merged["Profit"] = {**defaults.get("Profit", {}), **data.get("Profit", {})}
+        name = data.get("NAME") or os.path.splitext(os.path.basename(path))[0]
+        return cls(name, merged)
+
+    def accepts(self, item_id: str, category: Optional[str], listings: int,
+                lowest: int, profit: int) -> bool:
+        """The per-profile part of the flip check, applied to an already-priced item."""
+        return (
+            category in self.allowed_categories
+            and item_id not in self.blacklisted_tags
+            and listings >= self.min_listings
+            and lowest <= self.max_cost
+            and profit >= max(self.min_profit, lowest * (self.min_profit_percentage / 100))
+        )
+
+class Thresholds:
+    """The loosest limits across all profiles, used to pre-filter items once per scan."""
+
+    def __init__(self, profiles: List[Profile]):
+        self.min_profit = min(p.min_profit for p in profiles)
+        self.min_profit_percentage = min(p.min_profit_percentage for p in profiles)
+        self.max_cost = max(p.max_cost for p in profiles)
+        self.min_listings = min(p.min_listings for p in profiles)
+        self.allowed_categories = set().union(*(p.allowed_categories for p in profiles))
+
+def load_profiles(directory: str, defaults: Dict[str, Any]) -> List[Profile]:
+    """Every *.json in `directory` is a profile; without any, the main settings are the only one."""
+    profiles = []
+    if os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".json"):
+                profiles.append(Profile.from_file(os.path.join(directory, filename), defaults))
+
+    if not profiles:
+        profiles.append(Profile("default", defaults))
+    return profiles
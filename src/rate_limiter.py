@@ -0,0 +1,120 @@
+import time
+import asyncio
+
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+class RateLimiter:
+    """
+    Token bucket whose rate follows what the server tolerates.
+
+    - every successful request nudges the rate up by `step` requests/s
+    - a 429 cuts it by `backoff` once per throttling episode (the other requests that
+      were in flight at the time don't cut it again) and pauses the bucket for the
+      server's Retry-After
+    - the rate a 429 arrived at is remembered as the ceiling; growth stops just under
+      it and only probes past it very slowly, so throughput settles near the limit
+      instead of sawing back and forth across it
+    """
+
+    def __init__(self, rate: float = 20.0, min_rate: float = 0.5, max_rate: float = 200.0,
+                 step: float = 0.25, backoff: float = 0.7):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+        self.backoff = backoff
+        self.ceiling: Optional[float] = None
+
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._episode_until = 0.0
+
+        self.requests = 0
+        self.throttled = 0
+
+    @property
+    def burst(self) -> float:
+        return max(1.0, self.rate)
+
+    async def acquire(self, reserve: float = 0.0):
+        """
+        Waits for a token. Background callers pass a `reserve` share of the burst that has
+        to be left in the bucket before they take one, so they only use spare capacity and
+        callers waiting on a single token always go first.
+        """
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            need = max(1.0, reserve * self.burst)
+            if self._tokens >= need:
+                self._tokens -= 1
+                self.requests += 1
+                return
+            await asyncio.sleep((need - self._tokens) / self.rate)
+
+    def on_success(self):
+        if self.ceiling is None or self.rate < self.ceiling * 0.95:
+            limit = self.max_rate if self.ceiling is None else self.ceiling * 0.95
+            self.rate = min(limit, self.rate + self.step)
+        else:
+            self.rate = min(self.max_rate, self.rate + self.step * 0.02)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        self.throttled += 1
+        now = time.monotonic()
+        pause = retry_after if retry_after is not None else 1.0
+        self._paused_until = max(self._paused_until, now + pause)
+        self._tokens = 0.0
+
+        if now < self._episode_until:
+            return
+        self.ceiling = self.rate
+        self.rate = max(self.min_rate, self.rate * self.backoff)
+        self._episode_until = now + max(pause, 1.0)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rate": round(self.rate, 2),
+            "ceiling": round(self.ceiling, 2) if self.ceiling is not None else None,
+            "requests": self.requests,
+            "throttled": self.throttled,
+        }
+
+# -----------------------------
+# SHARED LIMITERS
+# -----------------------------
+
+_limiters: Dict[str, RateLimiter] = {}
+
+def limiter_for(url: str) -> RateLimiter:
+    """The limiter every request to this URL's host goes through."""
+    host = urlparse(url).netloc
+    limiter = _limiters.get(host)
+    if limiter is None:
+        limiter = _limiters[host] = RateLimiter()
+    return limiter
+
+def limiter_stats() -> Dict[str, Dict[str, float]]:
+    return {host: limiter.stats() for host, limiter in _limiters.items()}
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, in either its seconds or date form."""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,183 @@
+"""
+Backtests the flip finder on recorded scans: no network, as fast as the evaluation runs.
+
+    python replay.py Recordings\\scans.log
+    python replay.py Recordings\\scans.log --settings Tuned.json --json report.json
+
+Record scans by setting "RECORD_SCANS" to a file path in Settings.json. Each recorded
+scan is applied to a MarketState and run through the same evaluator and profile
+checks as a live scan. Daily volume comes from the sales seen in the recording
+itself, so it is only known once the recording covers --min-coverage seconds; flips
+before that are reported as unverified rather than dropped.
+"""
+
+import json
+import math
+import time
+import argparse
+
+from typing import Any, Dict, List, Optional
+from market import MarketState
+from price_history import PriceHistory
+from profiles import Thresholds, load_profiles, load_settings
+from evaluator import match_profiles, select_candidates
+from scan_log import ScanLog, uuid_strings
+
+class Replay:
+    def __init__(self, settings: Dict[str, Any], profiles_dir: Optional[str] = None,
+                 min_coverage: float = 3600, verbose: bool = True):
+        self.profiles = load_profiles(profiles_dir or settings.get("PROFILES_DIR", "Profiles"), settings)
+        self.limits = Thresholds(self.profiles)
+        self.resale_estimate = settings.get("RESALE_ESTIMATE", "second_lowest")
+        self.incomplete_scans = settings.get("INCOMPLETE_SCANS", "suppress")
+        self.min_coverage = min_coverage
+        self.verbose = verbose
+
+        self.market = MarketState()
+        self.history = PriceHistory()
+
+        self.flips: List[Dict[str, Any]] = []
+        self.scans = 0
+        self.rows = 0
+        self.evaluated = 0
+        self.elapsed = 0.0
+
+    def _apply(self, log: ScanLog, block) -> set:
+        """Brings the market to the block's state and returns the item ids that changed."""
+        market = self.market
+        changed = set()
+
+        for uuid in uuid_strings(block.sold):
+            item_id = market.item_of(uuid)
+            if item_id is not None:
+                self.history.note_sold(item_id)
+
+        if block.keyframe:
+            market.reset()
+        for uuid in uuid_strings(block.removed):
+            item_id = market.remove(uuid)
+            if item_id is not None:
+                changed.add(item_id)
+        for entry in log.entries(block):
+            changed.add(market.add(entry))
+
+        if block.keyframe:
+            changed = set(market.groups)
+        market.last_updated = block.last_updated
+        market.completeness = block.completeness
+        return changed
+
+    def _evaluate(self, changed: set, now: float):
+        market = self.market
+        groups = market.groups
+
+        if market.completeness >= 1:
+            self.history.record(groups, now)
+
+        medians = {}
+        if self.resale_estimate == "median":
+            changed_ids = list(changed)
+            medians = dict(zip(changed_ids, self.history.price_percentiles(changed_ids, 50, now)))
+
+        candidates = select_candidates(groups, changed, medians, self.limits)
+        matches = match_profiles(groups, candidates, self.profiles)
+        if not matches or (market.completeness < 1 and self.incomplete_scans == "suppress"):
+            return
+
+        item_ids = list({item[0] for _, item in matches})
+        if self.history.coverage(now) >= self.min_coverage:
+            volumes = dict(zip(item_ids, self.history.daily_volumes(item_ids, now)))
+        else:
+            volumes = {}
+
+        for profile, (item_id, a1, a2, lowest, second, profit, uid) in matches:
+            volume = volumes.get(item_id, math.nan)
+            known = not math.isnan(volume)
+            if known and volume < profile.min_daily_volume:
+                continue
+
+            profile.sent_uuids.append(uid)
+            flip = {
+                "time": now,
+                "profile": profile.name,
+                "item_id": item_id,
+                "name": a1.full_name,
+                "lowest": lowest,
+                "second": second,
+                "profit": profit,
+                "volume": volume if known else None,
+                "uuid": uid,
+                "complete": market.completeness >= 1,
+            }
+            self.flips.append(flip)
+            if self.verbose:
+                volume_text = f"{volume:.2f}" if known else "unverified"
+                print(
+                    f"[Replay] {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))} [{profile.name}] "
+                    f"{flip['name']} | ID={item_id} | Profit: {profit:,} | Lowest: {lowest:,} | Volume: {volume_text}"
+                )
+
+    def run(self, path: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        with ScanLog(path) as log:
+            blocks = log.blocks()
+            try:
+                for block in blocks:
+                    start = time.perf_counter()
+                    changed = self._apply(log, block)
+                    self.rows += len(block.rows)
+                    # Only the changed items' books go through the evaluator
+                    groups = self.market.groups
+                    self.evaluated += sum(len(groups[item_id]) for item_id in changed if item_id in groups)
+                    self._evaluate(changed, block.time)
+                    self.elapsed += time.perf_counter() - start
+
+                    self.scans += 1
+                    if limit is not None and self.scans >= limit:
+                        break
+            finally:
+                # The block views pin the mapping until released
+                block = None
+                blocks.close()
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = max(self.elapsed, 1e-9)
+        per_profile: Dict[str, int] = {p.name: 0 for p in self.profiles}
+        for flip in self.flips:
+            per_profile[flip["profile"]] += 1
+        return {
+            "scans": self.scans,
+            "rows_applied": self.rows,
+            "auctions_evaluated": self.evaluated,
+            "seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed),
+            "auctions_per_second": round(self.evaluated / elapsed),
+            "flips": len(self.flips),
+            "unverified_flips": sum(1 for flip in self.flips if flip["volume"] is None),
+            "flips_per_profile": per_profile,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log")
+    parser.add_argument("--settings", help="settings file to evaluate with (default: the one main.py uses)")
+    parser.add_argument("--profiles", help="profiles folder (default: the settings' PROFILES_DIR)")
+    parser.add_argument("--min-coverage", type=float, default=3600, help="seconds of recording before volumes are trusted")
+    parser.add_argument("--limit", type=int, help="stop after this many scans")
+    parser.add_argument("--json", help="also write the report and every flip to this file")
+    parser.add_argument("--quiet", action="store_true", help="don't print each flip")
+    args = parser.parse_args()
+
+    replay = Replay(load_settings(args.settings), args.profiles, args.min_coverage, not args.quiet)
+    report = replay.run(args.log, args.limit)
+
+    print(
+        f"[Replay] {report['scans']} scans, {report['rows_applied']:,} auctions applied in {report['seconds']:.2f}s "
+        f"({report['rows_per_second']:,} auctions/s, {report['auctions_per_second']:,} evaluated/s)"
+    )
+    print(f"[Replay] {report['flips']} would-have-alerted flips ({report['unverified_flips']} without volume data): {report['flips_per_profile']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"report": report, "flips": replay.flips}, f, indent=2)
@@ -0,0 +1,253 @@
+import os
+import mmap
+import time
+import struct
+import hashlib
+import numpy as np
+
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+from market import Listing
+
+# -----------------------------
+# ON-DISK FORMAT
+# -----------------------------
+#
+# A magic line followed by one block per recorded scan:
+#   header    kind, time, lastUpdated, completeness and the section sizes below
+#   strings   new strings, NUL separated; each defines the next string code
+#   rows      the BINs added since the previous block, fixed width (ROW)
+#   removed   16 byte uuids of listings gone since the previous block
+#   sold      16 byte uuids the ended feed reported as sold in this scan
+#
+# A keyframe block holds the whole market instead of the additions, and has no
+# removals. Every section is a multiple of 8 bytes and fixed width, so a reader maps
+# the file and views each section as a NumPy array without copying or parsing.
+# Blocks are only ever appended; a torn final block is ignored on read.
+
+_MAGIC = b"SCANLOG1"
+_HEADER = struct.Struct("<Bxxxdqf5I4x")
+
+KEYFRAME = 1
+DELTA = 0
+
+ROW = np.dtype([
+    ("uuid", "V16"),
+    ("price", "<i8"),
+    ("item", "<u4"),
+    ("name", "<u4"),
+    ("category", "<u4"),
+    ("count", "<i2"),
+    ("_pad", "<u2"),
+])
+UUID = np.dtype("V16")
+
+NO_CATEGORY = 0xFFFFFFFF
+
+
+def uuid_bytes(uuid: str) -> bytes:
+    """Hypixel uuids are 32 hex digits; anything else is stored as its md5, which replays consistently."""
+    try:
+        raw = bytes.fromhex(uuid)
+        if len(raw) == 16:
+            return raw
+    except ValueError:
+        pass
+    return hashlib.md5(uuid.encode("utf-8")).digest()
+
+
+def uuid_strings(values: np.ndarray) -> List[str]:
+    raw = values.tobytes()
+    return [raw[i:i + 16].hex() for i in range(0, len(raw), 16)]
+
+
+def _pad8(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 8)
+
+# -----------------------------
+# RECORDING
+# -----------------------------
+
+class ScanRecorder:
+    """
+    Appends each scan's market to a scan log as the difference from the previous scan,
+    with a keyframe every `keyframe_every` blocks and at the start of every session.
+    """
+
+    def __init__(self, path: str, keyframe_every: int = 60):
+        self.path = path
+        self.keyframe_every = keyframe_every
+
+        self._strings: Dict[str, int] = {}
+        self._previous: set = set()
+        self._blocks = 0
+
+    def load(self):
+        """Re-reads the string table so codes stay consistent when appending to an existing log."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        log = ScanLog(self.path)
+        try:
+            for _ in log.blocks(rows=False):
+                pass
+            self._strings = {s: i for i, s in enumerate(log.strings)}
+            end = log.end
+        finally:
+            log.close()
+
+        # Drop a torn final block so new blocks don't land after garbage
+        if os.path.getsize(self.path) > end:
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+
+    def _code(self, value: str, new: List[str]) -> int:
+        code = self._strings.get(value)
+        if code is None:
+            code = self._strings[value] = len(self._strings)
+            new.append(value)
+        return code
+
+    def checkpoint(self, market, sold: List[str], last_updated: Optional[int],
+                   completeness: float = 1.0, now: Optional[float] = None) -> Optional[Callable[[], None]]:
+        """
+        Captures the market's change since the previous call on the calling thread and
+        returns a writer that appends it, which can run anywhere.
+        """
+        now = time.time() if now is None else now
+        current = set(market.uuids())
+        keyframe = self._blocks % self.keyframe_every == 0
+
+        if keyframe:
+            added = current
+            removed = []
+        else:
+            added = current - self._previous
+            removed = list(self._previous - current)
+        self._previous = current
+        self._blocks += 1
+
+        new_strings: List[str] = []
+        uuids, prices, items, names, categories, counts = [], [], [], [], [], []
+        for uuid in added:
+            item_id = market.item_of(uuid)
+            entry = market.groups[item_id].get(uuid)
+            category = entry.category
+            uuids.append(uuid_bytes(uuid))
+            prices.append(entry.price)
+            items.append(self._code(item_id, new_strings))
+            names.append(self._code(entry.full_name, new_strings))
+            categories.append(NO_CATEGORY if category is None else self._code(category, new_strings))
+            counts.append(-1 if entry.count is None else entry.count)
+
+        rows = np.zeros(len(uuids), dtype=ROW)
+        if uuids:
+            rows["uuid"] = np.frombuffer(b"".join(uuids), dtype=UUID)
+            rows["price"] = prices
+            rows["item"] = items
+            rows["name"] = names
+            rows["category"] = categories
+            rows["count"] = counts
+
+        strings = _pad8("\0".join(new_strings).encode("utf-8") + (b"\0" if new_strings else b""))
+        removed_raw = b"".join(uuid_bytes(uuid) for uuid in removed)
+        sold_raw = b"".join(uuid_bytes(uuid) for uuid in sold if uuid)
+        header = _HEADER.pack(
+            KEYFRAME if keyframe else DELTA, now, -1 if last_updated is None else last_updated,
+            completeness, len(new_strings), len(strings), len(rows), len(removed_raw) // 16, len(sold_raw) // 16,
+        )
+        block = header + strings + rows.tobytes() + removed_raw + sold_raw
+
+        def write():
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, "ab") as f:
+                if new_file:
+                    f.write(_MAGIC)
+                f.write(block)
+
+        return write
+
+# -----------------------------
+# READING
+# -----------------------------
+
+class ScanBlock(NamedTuple):
+    keyframe: bool
+    time: float
+    last_updated: Optional[int]
+    completeness: float
+    rows: np.ndarray      # ROW view into the mapped file
+    removed: np.ndarray   # UUID view
+    sold: np.ndarray      # UUID view
+
+class ScanLog:
+    """Memory-maps a scan log; blocks() walks it without copying any section."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(_MAGIC)] != _MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a scan log")
+        self.strings: List[str] = []
+        self.end = len(_MAGIC)  # offset just past the last complete block read
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self) -> "ScanLog":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def blocks(self, rows: bool = True) -> Iterator[ScanBlock]:
+        """Yields every complete block in order; `strings` grows as they are read."""
+        data = self._map
+        size = len(data)
+        offset = len(_MAGIC)
+        self.strings = []
+
+        while offset + _HEADER.size <= size:
+            kind, when, last_updated, completeness, n_strings, strings_size, n_rows, n_removed, n_sold = \
+                _HEADER.unpack_from(data, offset)
+            start = offset + _HEADER.size
+            end = start + strings_size + n_rows * ROW.itemsize + (n_removed + n_sold) * 16
+            if end > size:
+                break  # torn final write
+
+            if n_strings:
+                blob = data[start:start + strings_size]
+                self.strings.extend(s.decode("utf-8") for s in blob.split(b"\0")[:n_strings])
+            start += strings_size
+
+            if rows:
+                row_view = np.frombuffer(data, dtype=ROW, count=n_rows, offset=start)
+                start += n_rows * ROW.itemsize
+                removed = np.frombuffer(data, dtype=UUID, count=n_removed, offset=start)
+                start += n_removed * 16
+                sold = np.frombuffer(data, dtype=UUID, count=n_sold, offset=start)
+                yield ScanBlock(
+                    kind == KEYFRAME, when, None if last_updated < 0 else last_updated,
+                    completeness, row_view, removed, sold,
+                )
+            else:
+                yield None
+
+            offset = self.end = end
+
+    def entries(self, block: ScanBlock) -> Iterator[Listing]:
+        """The block's added rows as market listings, as _build_entries would have made them."""
+        strings = self.strings
+        rows = block.rows
+        for uuid, price, item, name, category, count in zip(
+            uuid_strings(rows["uuid"]), rows["price"].tolist(), rows["item"].tolist(),
+            rows["name"].tolist(), rows["category"].tolist(), rows["count"].tolist(),
+        ):
+            yield Listing(
+                price, uuid, strings[name], strings[item],
+                None if count < 0 else count,
+                None if category == NO_CATEGORY else strings[category],
+            )
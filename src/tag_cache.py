@@ -0,0 +1,300 @@
+import os
+import sys
+import gzip
+import json
+import time
+import struct
+import hashlib
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from cache_store import set_aside_files, write_checkpoints
+
+
+class ItemRecord(NamedTuple):
+    """Everything later stages need from an auction's item_bytes, decoded once."""
+    id: str
+    count: Optional[int]
+
+
+# -----------------------------
+# ON-DISK FORMAT
+# -----------------------------
+#
+# An append-only log of blocks, one per save:
+#   <u32 new id count> <u32 entry count>
+#   new ids:  <u8 length> <utf-8 id>                        each defines the next id index
+#   entries:  <16 byte key> <u32 id index> <i16 count> <u32 last seen>
+#
+# Entries are fixed width so a whole block is unpacked in one struct.iter_unpack call.
+# Later entries for the same key win, so saving only ever appends what changed.
+# compact() rewrites the live set as a single block and swaps it in with os.replace.
+
+_MAGIC = b"TAGC2\n"
+_BLOCK = struct.Struct("<II")
+_ENTRY = struct.Struct("<16sIhI")
+
+KEY_SIZE = 16
+UNKNOWN_COUNT = -1
+
+# last_seen is only rewritten when it is this stale, so hits don't dirty the log every save
+SEEN_RESOLUTION = 3600
+
+
+class TagCache:
+    """
+    Bounded item_bytes -> ItemRecord cache.
+    Keys are truncated binary sha256 digests, ids are interned, and the least recently
+    used entries are evicted past `max_entries`. Entries unseen for `max_age` seconds are
+    dropped on load and compaction.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200_000, max_age: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+        self._entries: "OrderedDict[bytes, tuple[ItemRecord, int]]" = OrderedDict()
+        self._ids: Dict[str, int] = {}
+        self._dirty: Dict[bytes, tuple[ItemRecord, int]] = {}
+        self._new_ids: List[str] = []
+        self._file_entries = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # -----------------------------
+    # LOOKUPS
+    # -----------------------------
+
+    @staticmethod
+    def key_for(item_bytes: Any) -> bytes:
+        if isinstance(item_bytes, str):
+            item_bytes = item_bytes.encode("utf-8")
+        return hashlib.sha256(item_bytes).digest()[:KEY_SIZE]
+
+    def get(self, key: bytes) -> Optional[ItemRecord]:
+        """
+        The cached record, or None. Records without a count (carried over from the old
+        id-only cache) are misses, since the caller has to decode the item again anyway.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0].count is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        record, seen = entry
+        now = int(time.time())
+        if now - seen >= SEEN_RESOLUTION:
+            self._entries[key] = self._dirty[key] = (record, now)
+        return record
+
+    def put(self, key: bytes, record: ItemRecord):
+        record = ItemRecord(sys.intern(record.id), record.count)
+        if record.id not in self._ids:
+            self._ids[record.id] = len(self._ids)
+            self._new_ids.append(record.id)
+
+        entry = (record, int(time.time()))
+        self._entries[key] = self._dirty[key] = entry
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            old_key, _ = self._entries.popitem(last=False)
+            self._dirty.pop(old_key, None)
+            self.evictions += 1
+
+    def merge(self, other: "TagCache"):
+        """
+        Takes over another cache's entries and counters, e.g. the ones decoded into a
+        temporary cache while this one was loading. Its entries count as unsaved here.
+        """
+        for key, (record, _) in other._entries.items():
+            self.put(key, record)
+        self.hits += other.hits
+        self.misses += other.misses
+        self.evictions += other.evictions
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self._entries
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "ids": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "file_entries": self._file_entries,
+        }
+
+    # -----------------------------
+    # PERSISTENCE
+    # -----------------------------
+
+    def load(self, legacy_gz_path: Optional[str] = None):
+        """Loads the log, or migrates the old sha256-hex -> id JSON cache if there is no log yet."""
+        if not os.path.exists(self.path):
+            if legacy_gz_path and os.path.exists(legacy_gz_path):
+                self._load_legacy(legacy_gz_path)
+                self.compact()
+            return
+
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if not data.startswith(_MAGIC):
+            raise ValueError(f"{self.path} is not a tag cache file")
+
+        ids: List[str] = []
+        records: Dict[tuple, ItemRecord] = {}
+        entries = self._entries
+        cutoff = time.time() - self.max_age
+        view = memoryview(data)
+        pos = len(_MAGIC)
+        end = len(data)
+        good = pos  # end of the last complete block
+        file_entries = 0
+
+        while pos + _BLOCK.size <= end:
+            id_count, entry_count = _BLOCK.unpack_from(data, pos)
+            pos += _BLOCK.size
+
+            block_ids = []
+            for _ in range(id_count):
+                length = data[pos] if pos < end else 0
+                if pos + 1 + length > end:
+                    break
+                try:
+                    block_ids.append(sys.intern(data[pos + 1:pos + 1 + length].decode("utf-8")))
+                except UnicodeDecodeError:
+                    break
+                pos += 1 + length
+            entries_end = pos + entry_count * _ENTRY.size
+            if len(block_ids) < id_count or entries_end > end:
+                break  # torn final write, keep the complete blocks before it
+            ids.extend(block_ids)
+
+            id_total = len(ids)
+            for key, id_index, count, seen in _ENTRY.iter_unpack(view[pos:entries_end]):
+                if id_index >= id_total or seen < cutoff:
+                    entries.pop(key, None)
+                    continue
+                # Records are shared between every key with the same id and count
+                record = records.get((id_index, count))
+                if record is None:
+                    record = records[(id_index, count)] = ItemRecord(
+                        ids[id_index], None if count == UNKNOWN_COUNT else count
+                    )
+                entries[key] = (record, seen)
+            file_entries += entry_count
+            pos = good = entries_end
+
+        view.release()
+        # Cut a torn final block off, or every block appended after it would be misread
+        if good < end:
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+
+        self._ids = {item_id: i for i, item_id in enumerate(ids)}
+        self._file_entries = file_entries
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def _load_legacy(self, gz_path: str):
+        # Id-only entries are left behind: without a count they'd be decoded again anyway
+        with gzip.open(gz_path, "rt", encoding="utf-8") as f:
+            legacy = json.load(f)
+        for hex_key, value in legacy.items():
+            if isinstance(value, str):
+                continue
+            record = ItemRecord(*value)
+            if record.count is not None:
+                self.put(bytes.fromhex(hex_key)[:KEY_SIZE], record)
+
+    @staticmethod
+    def _encode_block(ids: List[str], id_indexes: Dict[str, int], entries: list) -> bytes:
+        out = bytearray(_BLOCK.pack(len(ids), len(entries)))
+        for item_id in ids:
+            raw = item_id.encode("utf-8")[:255]
+            out.append(len(raw))
+            out += raw
+
+        pack = _ENTRY.pack
+        for key, (record, seen) in entries:
+            count = UNKNOWN_COUNT if record.count is None else record.count
+            out += pack(key, id_indexes[record.id], count, seen)
+        return bytes(out)
+
+    def checkpoint(self) -> Optional[Callable[[], None]]:
+        """
+        Captures what changed since the last checkpoint and returns a function that
+        writes it, or None if there is nothing to write. Capturing is cheap and must
+        happen on the thread that mutates the cache; the returned writer only touches
+        the captured data, so it can run in a background thread.
+        """
+        # Rewrite once superseded entries make up most of the file
+        if not os.path.exists(self.path) or self._file_entries > 2 * len(self._entries) + 10_000:
+            return self._checkpoint_compact()
+        if not self._dirty and not self._new_ids:
+            return None
+
+        ids = list(self._new_ids)
+        id_indexes = dict(self._ids)
+        entries = list(self._dirty.items())
+        self._file_entries += len(entries)
+        self._dirty.clear()
+        self._new_ids.clear()
+
+        def write():
+            payload = self._encode_block(ids, id_indexes, entries)
+            with open(self.path, "ab") as f:
+                f.write(payload)
+
+        return write
+
+    def _checkpoint_compact(self) -> Callable[[], None]:
+        cutoff = time.time() - self.max_age
+        live = [(key, entry) for key, entry in self._entries.items() if entry[1] >= cutoff]
+
+        # Renumber ids so ones that are no longer referenced get dropped. Ids added after
+        # this point continue from the new numbering and are appended after the rewrite.
+        ids = list(dict.fromkeys(record.id for _, (record, _) in live))
+        self._ids = {item_id: i for i, item_id in enumerate(ids)}
+        id_indexes = dict(self._ids)
+
+        self._entries = OrderedDict(live)
+        self._file_entries = len(live)
+        self._dirty.clear()
+        self._new_ids.clear()
+
+        def write():
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(_MAGIC)
+                f.write(self._encode_block(ids, id_indexes, live))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+        return write
+
+    def set_aside(self) -> List[str]:
+        """Moves an unreadable log to <path>.corrupt; the next checkpoint then writes a fresh one."""
+        self._file_entries = 0
+        return set_aside_files([self.path])
+
+    def save(self):
+        """Writes pending changes synchronously."""
+        write_checkpoints([self.checkpoint()])
+
+    def compact(self):
+        """Rewrites the live entries into a fresh log and swaps it in atomically."""
+        write_checkpoints([self._checkpoint_compact()])
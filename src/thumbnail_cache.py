@@ -0,0 +1,129 @@
+import os
+import asyncio
+import hashlib
+import aiohttp
+
+from io import BytesIO
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+class ThumbnailCache:
+    """
+    Icon URL -> rendered PNG thumbnail bytes.
+    Recently used thumbnails stay in memory (LRU), and every rendered thumbnail is also
+    written to `directory`, so an icon is downloaded and resized at most once ever.
+    Concurrent requests for the same URL share a single download.
+    """
+
+    def __init__(self, directory: str, max_items: int = 2048, size=(50, 50)):
+        self.directory = directory
+        self.max_items = max_items
+        self.size = size
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".png")
+
+    def _remember(self, url: str, png: bytes):
+        self._memory[url] = png
+        self._memory.move_to_end(url)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def render(content: bytes, size=(50, 50)) -> bytes:
+        # Imported on first render, which always runs on a worker thread
+        from PIL import Image
+
+        img = Image.open(BytesIO(content)).convert("RGBA")
+        img = img.resize(size, Image.Resampling.LANCZOS)
+        buf = BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+
+    def _read_disk(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, path: str, png: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+
+    async def get(self, session: aiohttp.ClientSession, url: str) -> Optional[bytes]:
+        if not url:
+            return None
+
+        png = self._memory.get(url)
+        if png is not None:
+            self.hits += 1
+            self._memory.move_to_end(url)
+            return png
+
+        pending = self._in_flight.get(url)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[url] = future
+        try:
+            png = await self._load(session, url)
+            future.set_result(png)
+            return png
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't warn if there were none
+            raise
+        finally:
+            del self._in_flight[url]
+
+    async def _load(self, session: aiohttp.ClientSession, url: str) -> bytes:
+        path = self._path(url)
+        png = await asyncio.to_thread(self._read_disk, path)
+        if png is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            async with session.get(url) as resp:
+                resp.raise_for_status()
+                content = await resp.read()
+            # PIL and file I/O stay off the event loop
+            png = await asyncio.to_thread(self.render, content, self.size)
+            await asyncio.to_thread(self._write_disk, path, png)
+
+        self._remember(url, png)
+        return png
+
+    async def prewarm(self, session: aiohttp.ClientSession, urls: Iterable[str], concurrency: int = 4):
+        """Renders every URL ahead of time, a few at a time so it never competes with scans."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(url: str):
+            async with semaphore:
+                try:
+                    await self.get(session, url)
+                except Exception:
+                    pass
+
+        urls = [url for url in dict.fromkeys(urls) if url]
+        await asyncio.gather(*(warm(url) for url in urls))
+        print(f"[Thumbnails] Pre-warmed {len(urls)} thumbnails ({self.misses} rendered)")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory": len(self._memory),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,175 @@
+import time
+import asyncio
+import aiohttp
+
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional
+from cache_store import JournalDict
+from rate_limiter import limiter_for, retry_after
+
+class VolumeService:
+    """
+    Average daily sales volume per item id, from coflnet's daily price history.
+
+    - at most `concurrency` history requests are in flight at once
+    - concurrent lookups of the same id share one request
+    - results live in a disk-backed TTL store, so they survive restarts
+    - failures are cached too, with exponential backoff, and the last good value (if
+      any) keeps being served until a retry succeeds
+    - ids that keep showing up as flip candidates are refreshed in the background
+      before they expire, so the flip path rarely waits on the network
+    """
+
+    TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+    def __init__(self, path: str, api: str = "https://sky.coflnet.com", ttl: float = 300,
+                 concurrency: int = 8, base_backoff: float = 15, max_backoff: float = 900):
+        self.api = api.rstrip("/")
+        self.ttl = ttl
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        # item id -> [volume or None, expires at, consecutive failures]
+        self.store = JournalDict(path)
+
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._demand: Counter = Counter()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._owns_session = False
+
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+        self.failures = 0
+
+    # -----------------------------
+    # LIFECYCLE
+    # -----------------------------
+
+    def load(self):
+        self.store.load()
+
+    def checkpoint(self) -> Optional[Callable[[], None]]:
+        return self.store.checkpoint()
+
+    def set_aside(self) -> List[str]:
+        return self.store.set_aside()
+
+    def start(self, session: aiohttp.ClientSession):
+        """Borrows a shared session; without one, the service opens its own on first use."""
+        self._session = session
+        self._owns_session = False
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.TIMEOUT)
+            self._owns_session = True
+        return self._session
+
+    async def close(self):
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+        self._session = None
+
+    # -----------------------------
+    # LOOKUPS
+    # -----------------------------
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def peek(self, item_id: str) -> Optional[float]:
+        """The stored volume if it is still fresh, without touching the network."""
+        entry = self.store.get(item_id)
+        if entry is not None and time.time() < entry[1]:
+            return entry[0]
+        return None
+
+    async def get(self, item_id: str) -> Optional[float]:
+        self._demand[item_id] += 1
+
+        entry = self.store.get(item_id)
+        if entry is not None and time.time() < entry[1]:
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        return await asyncio.shield(self._shared_refresh(item_id))
+
+    def _shared_refresh(self, item_id: str) -> asyncio.Future:
+        """Starts a refresh for the id, or joins the one already running."""
+        pending = self._in_flight.get(item_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._refresh(item_id))
+            self._in_flight[item_id] = pending
+            pending.add_done_callback(lambda _: self._in_flight.pop(item_id, None))
+        return pending
+
+    async def _refresh(self, item_id: str) -> Optional[float]:
+        async with self._semaphore:
+            self.requests += 1
+            try:
+                url = f"{self.api}/api/item/price/{item_id}/history/day"
+                limiter = limiter_for(url)
+                await limiter.acquire()
+                async with self._get_session().get(url, timeout=self.TIMEOUT) as resp:
+                    if resp.status == 200:
+                        data = await resp.json()
+                        limiter.on_success()
+                        volume = 0.0
+                        if isinstance(data, list) and len(data) > 0:
+                            volume = sum(x.get("volume", 0) for x in data) / len(data)
+                        self.store[item_id] = [volume, time.time() + self.ttl, 0]
+                        return volume
+                    if resp.status == 429:
+                        limiter.on_throttle(retry_after(resp.headers))
+            except Exception:
+                pass
+
+        return self._record_failure(item_id)
+
+    def _record_failure(self, item_id: str) -> Optional[float]:
+        self.failures += 1
+        previous = self.store.get(item_id)
+        volume, failures = (previous[0], previous[2]) if previous else (None, 0)
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** failures)
+        self.store[item_id] = [volume, time.time() + backoff, failures + 1]
+        return volume
+
+    # -----------------------------
+    # BACKGROUND PREFETCH
+    # -----------------------------
+
+    def hot_ids(self, limit: int) -> Iterable[str]:
+        return [item_id for item_id, _ in self._demand.most_common(limit)]
+
+    async def prefetch(self, item_ids: Iterable[str], horizon: float = 60):
+        """Refreshes the given ids whose entries expire within `horizon` seconds."""
+        soon = time.time() + horizon
+        due = [
+            item_id for item_id in item_ids
+            if item_id not in self.store or self.store[item_id][1] <= soon
+        ]
+        await asyncio.gather(*(self._shared_refresh(item_id) for item_id in due))
+
+    async def prefetch_loop(self, interval: float = 60, limit: int = 200):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.prefetch(self.hot_ids(limit), horizon=interval)
+            except Exception as e:
+                print(f"[Volume] Prefetch failed: {e}")
+            # Let old demand fade so the hot set follows the market
+            self._demand = Counter({k: v // 2 for k, v in self._demand.items() if v > 1})
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.store),
+            "hits": self.hits,
+            "misses": self.misses,
+            "requests": self.requests,
+            "failures": self.failures,
+            "in_flight": len(self._in_flight),
+        }